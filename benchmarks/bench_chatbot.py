@@ -0,0 +1,72 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Measures the latency of `HAL9000.on_input` for every pattern of the `_responses` table and of every command.
+
+    python benchmarks/bench_chatbot.py [--number 200]
+"""
+
+import argparse
+
+from common import format_result, per_call, record
+
+from headless import TextEvent
+from main import HAL9000
+from worker import BufferedTerminal
+
+# One utterance for every pattern of `HAL9000._responses`, in the same order.
+UTTERANCES = ('hal.', 'hello', 'good morning', 'where am i?', 'who is in the kitchen?', 'open gate 1', 'close gate 1',
+              'where can i go?', 'how can i get to the kitchen?', 'can i get to the store?',
+              'go to the engineering module', 'ok', 'really?', 'sing me a song', '?')
+
+COMMANDS = ('open gate 1', 'close gate 1', 'goto engineering module', 'goto start location', 'where',
+            'where kitchen', 'where gate 1', 'transitions', 'reachable store', 'who kitchen', 'unknown')
+
+
+def suite(number=200):
+    terminal = BufferedTerminal()
+    agent = HAL9000(terminal)
+    chatbot = agent._chatbot
+    results = []
+
+    for pattern, text in enumerate(UTTERANCES):
+        assert chatbot.match(text)[0] == pattern, text
+        event = TextEvent(text)
+
+        def on_input():
+            for _ in range(number):
+                agent.on_input(event)
+                terminal.flush()
+
+        def match_uncached():
+            for _ in range(number):
+                chatbot._match(text)
+
+        results.append(record('chatbot', 'on_input', per_call(on_input, number), pattern=pattern, input=text))
+        results.append(record('chatbot', 'match_uncached', per_call(match_uncached, number), pattern=pattern,
+                              input=text))
+
+    for command in COMMANDS:
+        def execute_command():
+            for _ in range(number):
+                agent._execute_command(command)
+                terminal.flush()
+
+        results.append(record('chatbot', 'execute_command', per_call(execute_command, number), command=command))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=200, help='calls per measurement')
+    args = parser.parse_args()
+
+    for result in suite(args.number):
+        print(format_result(result))
+
+
+if __name__ == '__main__':
+    main()
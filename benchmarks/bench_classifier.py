@@ -0,0 +1,57 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Measures the throughput of `classifier.IntentClassifier` on batches of utterances, against answering them one
+by one with `matcher.IntentMatcher`. Neither engine caches the inputs.
+
+    python benchmarks/bench_classifier.py [--sizes 1 10 100 1000 10000]
+"""
+
+import argparse
+import random
+import timeit
+
+from common import record
+
+import nltk.chat.util
+
+from classifier import IntentClassifier
+from main import HAL9000
+from matcher import IntentMatcher
+
+# Door and room numbers are filled in randomly, so that batches hold repeated as well as unique utterances.
+UTTERANCES = ('hello', 'good morning', 'where am i?', 'open gate {}', 'please close vent flap {}', 'where can i go?',
+              'how can i get to the cabin {}?', 'can i get to the store?', 'go to the cabin {}',
+              'i want to go to store', 'ok', 'really?', 'sing me a song', 'plase open gate {}', 'take me to the kitchn')
+
+
+def suite(sizes=(1, 10, 100, 1000, 10000)):
+    classifier = IntentClassifier(HAL9000._responses, nltk.chat.util.reflections, cache_size=0)
+    matcher = IntentMatcher(HAL9000._responses, nltk.chat.util.reflections, cache_size=0)
+    generator = random.Random(0)
+    results = []
+    for size in sizes:
+        batch = [generator.choice(UTTERANCES).format(generator.randrange(1000)) for _ in range(size)]
+        repeat = max(3, 1000 // size)
+        classified = min(timeit.repeat(lambda: classifier.respond_batch(batch), number=1, repeat=repeat))
+        matched = min(timeit.repeat(lambda: [matcher.respond(text) for text in batch], number=1, repeat=repeat))
+        results.append(record('classifier', 'respond_batch', size / classified, 'utterances/s', batch=size))
+        results.append(record('classifier', 'matcher_respond', size / matched, 'utterances/s', batch=size))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    print('{:>8} {:>18} {:>18}'.format('batch', 'classifier (1/s)', 'matcher (1/s)'))
+    results = suite(args.sizes)
+    for classified, matched in zip(results[::2], results[1::2]):
+        print('{:>8} {:>18.0f} {:>18.0f}'.format(classified['params']['batch'], classified['value'], matched['value']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Measures the crew simulation on a generated ship: building the next-hop tables, stepping the whole crew and
+asking who is in a room, for growing crews.
+
+    python benchmarks/bench_crew.py [--sizes 1000 10000 100000] [--rooms 10000]
+"""
+
+import argparse
+import time
+
+from common import format_result, per_call, record
+
+from compact_map import CompactMap
+from crew import Crew
+from layout import load_text_layout
+from map import DoorState
+from shipgen import ShipTopology
+
+
+def suite(sizes=(1000, 10000, 100000), rooms=10000):
+    ship = load_text_layout(ShipTopology(rooms).layout_lines(), CompactMap())
+    door = next(iter(ship.doors()))
+    results = []
+    for size in sizes:
+        crew = Crew(ship, size)
+        started = time.perf_counter()
+        crew.step()
+        results.append(record('crew', 'next_hops', time.perf_counter() - started, rooms=rooms, crew=size))
+        results.append(record('crew', 'step', per_call(crew.step, 1, repeat=10), rooms=rooms, crew=size))
+
+        def step_after_door():
+            door.set_state(DoorState.CLOSED if door.state() == DoorState.OPEN else DoorState.OPEN)
+            crew.step()
+        results.append(record('crew', 'step_after_door', per_call(step_after_door, 1, repeat=3), rooms=rooms,
+                              crew=size))
+
+        room = crew.busiest(1)[0][0]
+        results.append(record('crew', 'who', per_call(lambda: crew.members(room), 1, repeat=10), rooms=rooms,
+                              crew=size))
+        crew.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='crew members')
+    parser.add_argument('--rooms', type=int, default=10000, help='rooms of the generated ship')
+    args = parser.parse_args()
+
+    for result in suite(args.sizes, args.rooms):
+        print(format_result(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Compares memory use and lookup cost of `map.Map` and `compact_map.CompactMap`.
+
+    python benchmarks/bench_map.py [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import record
+
+from compact_map import CompactMap
+from map import DoorState, Map
+from routing import RoutePlanner
+
+
+def build(map_class, rooms, seed=0):
+    """A corridor going through all rooms plus about one vent flap per room between random rooms.
+    """
+    generator = random.Random(seed)
+    ship = map_class()
+    names = ['room {}'.format(index) for index in range(rooms)]
+    ship.add_rooms(names)
+    for index in range(1, rooms):
+        ship.add_door('gate {}'.format(index), names[index - 1], names[index])
+    for index in range(rooms):
+        ship.add_door('vent flap {}'.format(index), generator.choice(names), generator.choice(names))
+    return ship
+
+
+def measure_memory(map_class, rooms):
+    tracemalloc.start()
+    ship = build(map_class, rooms)
+    if isinstance(ship, CompactMap):
+        ship.get_room('room 0').get_doors()  # Include the lazily built adjacency arrays.
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return ship, size
+
+
+def measure_lookups(ship, rooms, number=2000):
+    generator = random.Random(1)
+    room_names = ['room {}'.format(generator.randrange(rooms)) for _ in range(number)]
+    door_names = ['gate {}'.format(generator.randrange(1, rooms)) for _ in range(number)]
+
+    def rooms_lookup():
+        for name in room_names:
+            ship.get_room(name)
+
+    def doors_lookup():
+        for name in door_names:
+            ship.get_door(name).state()
+
+    def transitions():
+        for name in room_names:
+            ship.get_room(name).possible_transitions()
+
+    return [min(timeit.repeat(function, number=1, repeat=3)) / number for function in
+            (rooms_lookup, doors_lookup, transitions)]
+
+
+def measure_fuzzy_lookups(ship, rooms, number=200):
+    """Cost of looking up misspelled room names, once the fuzzy index has been built.
+    """
+    generator = random.Random(2)
+    names = ['rom {}'.format(generator.randrange(rooms)) for _ in range(number)]
+    ship.index_names()
+
+    def lookups():
+        for name in names:
+            ship.find_room(name)
+
+    return min(timeit.repeat(lookups, number=1, repeat=3)) / number
+
+
+def measure_completions(ship, rooms, number=200):
+    """Cost of completing name prefixes as typed key by key, once the name trie has been built.
+    """
+    generator = random.Random(3)
+    prefixes = []
+    for _ in range(number // 10):
+        name = 'vent flap {}'.format(generator.randrange(rooms))
+        prefixes.extend(name[:length] for length in range(1, 11))
+    ship.index_names()
+
+    def completions():
+        for prefix in prefixes:
+            ship.complete(prefix, 10)
+
+    return min(timeit.repeat(completions, number=1, repeat=3)) / len(prefixes)
+
+
+def measure_growing(planner):
+    """Calls `planner.grow` until its trees are complete and returns the average time of a call.
+    """
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        calls += 1
+        if not planner.grow():
+            break
+    return (time.perf_counter() - started) / calls
+
+
+def suite(sizes=(1000, 10000, 100000)):
+    """Construction, memory, lookup and routing cost of both map backends, as `common.record` results.
+    """
+    results = []
+    for rooms in sizes:
+        for map_class in (Map, CompactMap):
+            backend = map_class.__name__
+            construction = min(timeit.repeat(lambda: build(map_class, rooms), number=1, repeat=3))
+            ship, size = measure_memory(map_class, rooms)
+            results.append(record('map', 'build', construction, rooms=rooms, backend=backend))
+            results.append(record('map', 'memory', size, 'bytes', rooms=rooms, backend=backend))
+            for name, timing in zip(('get_room', 'get_door', 'transitions'), measure_lookups(ship, rooms)):
+                results.append(record('map', name, timing, rooms=rooms, backend=backend))
+            results.append(record('map', 'find_room_typo', measure_fuzzy_lookups(ship, rooms), rooms=rooms,
+                                  backend=backend))
+            results.append(record('map', 'complete', measure_completions(ship, rooms), rooms=rooms, backend=backend))
+
+            for door in ship.doors():
+                door.set_state(DoorState.OPEN)
+            source, target = 'room 0', 'room {}'.format(rooms - 1)
+            cold = min(timeit.repeat(lambda: RoutePlanner(ship).route(source, target), number=1, repeat=3))
+            planner = RoutePlanner(ship)
+            planner.route(source, target)
+            repeat = min(timeit.repeat(lambda: planner.route(source, target), number=1, repeat=1))
+            grow = measure_growing(planner)
+            warm = min(timeit.repeat(lambda: planner.route(source, 'room {}'.format(rooms // 2)),
+                                     number=100, repeat=3)) / 100
+            results.append(record('map', 'route_cold', cold, rooms=rooms, backend=backend))
+            results.append(record('map', 'route_repeat', repeat, rooms=rooms, backend=backend))
+            results.append(record('map', 'route_grow', grow, rooms=rooms, backend=backend))
+            results.append(record('map', 'route_warm', warm, rooms=rooms, backend=backend))
+
+            # Closing a door of the tree leaves its subtree to be repaired by `grow`, routes are searched meanwhile.
+            gates = [ship.get_door('gate {}'.format(index)) for index in range(1, rooms, max(1, rooms // 100))]
+            def close_and_route():
+                for gate in gates:
+                    gate.set_state(DoorState.CLOSED)
+                    planner.route(source, 'room {}'.format(rooms // 2))
+                    gate.set_state(DoorState.OPEN)
+            after_close = min(timeit.repeat(close_and_route, number=1, repeat=3)) / len(gates)
+            results.append(record('map', 'route_after_close', after_close, rooms=rooms, backend=backend))
+            results.append(record('map', 'route_repair', measure_growing(planner), rooms=rooms, backend=backend))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print('{:>8} {:>12} {:>10} {:>14} {:>14} {:>16}'.format('rooms', 'backend', 'memory MB', 'get_room (us)',
+                                                               'get_door (us)', 'transitions (us)'))
+    for rooms in args.sizes:
+        for map_class in (Map, CompactMap):
+            ship, size = measure_memory(map_class, rooms)
+            timings = measure_lookups(ship, rooms)
+            print('{:>8} {:>12} {:>10.1f} {:>14.2f} {:>14.2f} {:>16.2f}'.format(
+                rooms, map_class.__name__, size / 2.0 ** 20, *[timing * 1e6 for timing in timings]))
+
+
+if __name__ == '__main__':
+    main()
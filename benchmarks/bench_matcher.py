@@ -0,0 +1,78 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Compares `matcher.IntentMatcher` against `nltk.chat.Chat` on growing pattern tables.
+
+    python benchmarks/bench_matcher.py [--sizes 13 100 500 1000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nltk.chat.util
+
+from main import HAL9000
+from matcher import IntentMatcher
+
+VERBS = ('activate', 'disable', 'check', 'repair', 'report', 'lock', 'unlock', 'scan', 'reset', 'calibrate')
+NOUNS = ('reactor', 'antenna', 'airlock', 'pod bay', 'hibernation unit', 'life support', 'navigation', 'radar',
+         'thruster', 'gyroscope', 'camera', 'storage', 'comms array', 'water tank', 'oxygen supply')
+
+UTTERANCES = ('hello', 'good morning', 'where am i?', 'open gate 1', 'please close vent flap 2', 'where can i go?',
+              'how can i get to the kitchen?', 'go to the main corridor', 'i want to go to store', 'ok', 'really?',
+              'sing me a song', '.', 'activate the reactor 7', 'please check the radar 12')
+
+
+def make_pairs(size):
+    """Synthetic intent table: `size - 13` generated command intents followed by the HAL9000 table.
+    """
+    pairs = []
+    index = 0
+    while len(pairs) < size - len(HAL9000._responses):
+        verb = VERBS[index % len(VERBS)]
+        noun = NOUNS[(index // len(VERBS)) % len(NOUNS)]
+        pairs.append((r'(please )?{} the {} {}\b([\w\s]*)'.format(verb, noun, index), ['Done with %3.']))
+        index += 1
+    return pairs + HAL9000._responses
+
+
+def bench(respond, repeat):
+    def run():
+        for text in UTTERANCES:
+            respond(text)
+    return min(timeit.repeat(run, number=20, repeat=repeat)) / (20 * len(UTTERANCES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[13, 100, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{:>8} {:>14} {:>14} {:>8}'.format('patterns', 'nltk (us)', 'matcher (us)', 'speedup'))
+    for size in args.sizes:
+        pairs = make_pairs(size)
+        chat = nltk.chat.Chat(pairs, nltk.chat.util.reflections)
+        matcher = IntentMatcher(pairs, nltk.chat.util.reflections)
+
+        for text in UTTERANCES:  # Both engines must pick the same pattern and produce the same response.
+            random.seed(0)
+            expected = chat.respond(text)
+            random.seed(0)
+            assert matcher.respond(text) == expected, text
+
+        nltk_time = bench(chat.respond, args.repeat)
+        matcher_time = bench(matcher.respond, args.repeat)
+        print('{:>8} {:>14.2f} {:>14.2f} {:>7.1f}x'.format(len(pairs), nltk_time * 1e6, matcher_time * 1e6,
+                                                           nltk_time / matcher_time))
+
+
+if __name__ == '__main__':
+    main()
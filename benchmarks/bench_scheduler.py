@@ -0,0 +1,71 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Measures `scheduler.Scheduler` with many pending timers: scheduling, cancelling and the cost of a tick firing
+ten timers, which should not grow with the number of timers that are not due yet.
+
+    python benchmarks/bench_scheduler.py [--sizes 1000 100000 1000000]
+"""
+
+import argparse
+import random
+import time
+
+from common import format_result, record
+
+from scheduler import RESOLUTION, Scheduler
+
+HORIZON = 3600.0   # Pending timers are due in one to two hours,
+TICKS = 400        # while ticks are measured over the first 100 seconds,
+DUE = 10           # with this many timers due at every tick.
+
+
+def measure(size, seed=0):
+    now = [0.0]
+    scheduler = Scheduler(clock=lambda: now[0])
+    generator = random.Random(seed)
+    delays = [generator.uniform(HORIZON, 2 * HORIZON) for _ in range(size)]
+    delays.extend(generator.uniform(0.0, TICKS * RESOLUTION) for _ in range(TICKS * DUE))
+    generator.shuffle(delays)
+
+    started = time.perf_counter()
+    timers = [scheduler.schedule(delay, int) for delay in delays]
+    schedule = (time.perf_counter() - started) / len(delays)
+
+    started = time.perf_counter()
+    for _ in range(TICKS):
+        now[0] += RESOLUTION
+        scheduler.advance()
+    tick = (time.perf_counter() - started) / TICKS
+
+    cancelled = timers[::2]
+    started = time.perf_counter()
+    for timer in cancelled:
+        timer.cancel()
+    cancel = (time.perf_counter() - started) / len(cancelled)
+    return schedule, tick, cancel
+
+
+def suite(sizes=(1000, 100000, 1000000)):
+    results = []
+    for size in sizes:
+        schedule, tick, cancel = measure(size)
+        results.append(record('scheduler', 'schedule', schedule, pending=size))
+        results.append(record('scheduler', 'tick', tick, pending=size))
+        results.append(record('scheduler', 'cancel', cancel, pending=size))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+
+    for result in suite(args.sizes):
+        print(format_result(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Measures how loading and talking scale with generated ships: generation throughput, loading a layout into both
+map backends and replaying a generated conversation through HAL9000.
+
+    python benchmarks/bench_shipgen.py [--sizes 1000 10000 100000] [--utterances 2000]
+"""
+
+import argparse
+import time
+
+from common import format_result, record
+
+from compact_map import CompactMap
+from headless import replay
+from layout import load_text_layout
+from main import HAL9000
+from map import Map
+from shipgen import Conversation, ShipTopology
+
+
+def measure(rooms, utterances, chatbot):
+    results = []
+    topology = ShipTopology(rooms)
+
+    started = time.perf_counter()
+    lines = list(topology.layout_lines())
+    results.append(record('shipgen', 'generate_layout', len(lines) / (time.perf_counter() - started), 'lines/s',
+                          rooms=rooms))
+    started = time.perf_counter()
+    talk = list(Conversation(topology).lines(utterances))
+    results.append(record('shipgen', 'generate_talk', len(talk) / (time.perf_counter() - started), 'lines/s',
+                          rooms=rooms))
+
+    for map_class in (Map, CompactMap):
+        backend = map_class.__name__
+        started = time.perf_counter()
+        ship = load_text_layout(lines, map_class())
+        results.append(record('shipgen', 'load', time.perf_counter() - started, rooms=rooms, backend=backend))
+
+        started = time.perf_counter()
+        for _ in replay('talk', talk, ship, seed=0, chatbot=chatbot):
+            pass
+        results.append(record('shipgen', 'replay', (time.perf_counter() - started) / len(talk), rooms=rooms,
+                              backend=backend))
+    return results
+
+
+def suite(sizes=(1000, 10000, 100000), utterances=2000):
+    chatbot = HAL9000.create_chatbot()
+    results = []
+    for rooms in sizes:
+        results.extend(measure(rooms, utterances, chatbot))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--utterances', type=int, default=2000, help='length of the replayed conversation')
+    args = parser.parse_args()
+
+    for result in suite(args.sizes, args.utterances):
+        print(format_result(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Measures the cost of logging, scrolling and typing in `window.TerminalWindow` without opening a window.
+
+The terminal draws into a stub canvas and its timers never fire, so only the work done on the Python side is
+measured: history bookkeeping and updates of the Text visuals. Glyph layout happens at draw time and is not.
+
+    python benchmarks/bench_terminal.py [--number 2000]
+"""
+
+import argparse
+import collections
+
+from common import format_result, per_call, record
+
+import vispy.scene
+import vispy.util.event
+
+import window
+
+KeyEvent = collections.namedtuple('KeyEvent', 'key text modifiers')
+Key = collections.namedtuple('Key', 'name')
+
+
+class StubCanvas(object):
+    """Just enough of `vispy.scene.SceneCanvas` for the terminal: a size, events and a transformed root node.
+    """
+
+    def __init__(self, size=(1280, 720)):
+        object.__init__(self)
+        self.size = size
+        self.events = vispy.util.event.EmitterGroup(resize=None, key_press=None, key_release=None,
+                                                    mouse_press=None, mouse_wheel=None, draw=None)
+        self.central_widget = vispy.scene.Node()
+
+
+class StubTimer(object):
+
+    def __init__(self):
+        object.__init__(self)
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+
+class OffscreenTerminal(window.TerminalWindow):
+    """Terminal window drawing into a `StubCanvas`, for running without a display or an event loop.
+    """
+
+    def _create_canvas(self):
+        self.canvas = StubCanvas()
+        self.widget = self.canvas.central_widget
+        self.widget.set_transform('matrix')
+        self.widget.transform.translate((0.0, -window.CONSOLE_LINEOFFSET))
+        self.old_size = self.canvas.size
+
+    def _create_timer(self, interval, callback, iterations=-1):
+        return StubTimer()
+
+
+def suite(number=2000):
+    results = []
+
+    terminal = OffscreenTerminal()
+    lines = ['Line number {} of the history.'.format(index) for index in range(number)]
+    def log():
+        for index, line in enumerate(lines):
+            terminal.log(line, align='right' if index % 3 else 'left')
+    results.append(record('terminal', 'log', per_call(log, number, repeat=3), history=number))
+
+    terminal = OffscreenTerminal()
+    blocks = [[(line, 'right', '#00805A') for line in lines[index:index + 5]] for index in range(0, number, 5)]
+    def log_lines():
+        for block in blocks:
+            terminal.log_lines(block)
+    results.append(record('terminal', 'log_lines', per_call(log_lines, len(blocks) * 5, repeat=3), block=5))
+
+    def scroll():
+        for _ in range(number // 10):
+            terminal.scroll_history(3)
+        for _ in range(number // 10):
+            terminal.scroll_history(-3)
+    results.append(record('terminal', 'scroll_history', per_call(scroll, number // 5, repeat=3), lines=3))
+
+    def show_input():
+        for line in lines:
+            terminal.show_input(line)
+    results.append(record('terminal', 'show_input', per_call(show_input, number, repeat=3)))
+
+    events = [KeyEvent(Key(char.upper()), char, ()) for char in 'the quick brown fox jumps over the lazy dog']
+    def type_text():
+        for event in events:
+            terminal.on_key_press(event)
+            terminal.on_key_release(event)
+        terminal.on_redraw(None)
+        terminal.text_buffer = ''
+    results.append(record('terminal', 'key_press', per_call(type_text, len(events)), coalesced=True))
+
+    terminal.enable_metrics()
+    key_press = terminal._measured('event: key_press', terminal.on_key_press)
+    key_release = terminal._measured('event: key_release', terminal.on_key_release)
+    def type_text_measured():
+        for event in events:
+            key_press(event)
+            key_release(event)
+        terminal.on_redraw(None)
+        terminal.text_buffer = ''
+        terminal.canvas.events.draw()
+    results.append(record('terminal', 'key_press', per_call(type_text_measured, len(events)), coalesced=True,
+                          metrics=True))
+    def draw():
+        for _ in range(number):
+            terminal.canvas.events.draw()
+    results.append(record('terminal', 'frame_metrics', per_call(draw, number, repeat=3)))
+
+    terminal = OffscreenTerminal()
+    for index in range(window.SEARCH_HISTORY_SIZE):
+        terminal.text_buffer = '/{} gate {}'.format(('open', 'close', 'where')[index % 3], index % 1000)
+        terminal._on_press_enter()
+    search = KeyEvent(Key('R'), '', ('Control',))
+    def reverse_search():
+        terminal.text_buffer = '/open gate 1'
+        for _ in range(20):
+            terminal.on_key_press(search)
+            terminal.on_key_release(search)
+        terminal.on_redraw(None)
+    results.append(record('terminal', 'reverse_search', per_call(reverse_search, 20),
+                          history=window.SEARCH_HISTORY_SIZE))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='lines logged per measurement')
+    args = parser.parse_args()
+
+    for result in suite(args.number):
+        print(format_result(result))
+
+
+if __name__ == '__main__':
+    main()
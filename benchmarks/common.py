@@ -0,0 +1,62 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Helpers shared by the benchmark suites: timing, result records and their JSON files.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_call(function, calls, repeat=5):
+    """Returns the best time in seconds of a single call, `function` itself must make `calls` calls per run.
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat)) / calls
+
+
+def record(suite, name, value, unit='s', **params):
+    """A single benchmark result. Results of different runs are compared by `suite`, `name` and `params`.
+    """
+    return {'suite': suite, 'name': name, 'params': params, 'value': value, 'unit': unit}
+
+
+def record_key(result):
+    return result['suite'], result['name'], tuple(sorted(result['params'].items()))
+
+
+def write_results(path, results):
+    """Writes `results` together with a description of the machine and the interpreter that produced them.
+    """
+    document = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(document, stream, indent=1)
+        stream.write('\n')
+
+
+def read_results(path):
+    with open(path, 'r', encoding='utf-8') as stream:
+        return json.load(stream)['results']
+
+
+def format_result(result):
+    params = ' '.join('{}={}'.format(key, value) for key, value in sorted(result['params'].items()))
+    if result['unit'] == 's':
+        value = '{:.2f} us'.format(result['value'] * 1e6)
+    elif result['unit'] == 'bytes':
+        value = '{:.1f} MB'.format(result['value'] / 2.0 ** 20)
+    else:
+        value = '{:.2f} {}'.format(result['value'], result['unit'])
+    return '{:<10} {:<18} {:<44} {:>12}'.format(result['suite'], result['name'], params, value)
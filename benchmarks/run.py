@@ -0,0 +1,58 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Runs the benchmark suites without a display and writes their results as JSON, optionally comparing them
+with the results of an earlier run.
+
+    python benchmarks/run.py --output after.json --compare before.json
+    python benchmarks/run.py --suites chatbot map --quick
+"""
+
+import argparse
+import importlib
+
+from common import format_result, read_results, record_key, write_results
+
+SUITES = {
+    'chatbot': ('bench_chatbot', {'number': 200}, {'number': 20}),
+    'crew': ('bench_crew', {'sizes': (1000, 10000, 100000), 'rooms': 10000}, {'sizes': (1000, 10000), 'rooms': 1000}),
+    'classifier': ('bench_classifier', {'sizes': (1, 10, 100, 1000, 10000)}, {'sizes': (1, 100)}),
+    'map': ('bench_map', {'sizes': (1000, 10000, 100000)}, {'sizes': (1000, 10000)}),
+    'scheduler': ('bench_scheduler', {'sizes': (1000, 100000, 1000000)}, {'sizes': (1000, 100000)}),
+    'shipgen': ('bench_shipgen', {'sizes': (1000, 10000, 100000), 'utterances': 2000},
+                {'sizes': (1000, 10000), 'utterances': 500}),
+    'terminal': ('bench_terminal', {'number': 2000}, {'number': 200})
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suites', nargs='+', choices=sorted(SUITES), default=sorted(SUITES))
+    parser.add_argument('--quick', action='store_true', help='fewer iterations and smaller ships')
+    parser.add_argument('--output', default='benchmarks.json', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='print the change against an earlier results file')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        baseline = dict((record_key(result), result) for result in read_results(args.compare))
+
+    results = []
+    for name in args.suites:
+        module_name, arguments, quick_arguments = SUITES[name]
+        module = importlib.import_module(module_name)
+        for result in module.suite(**(quick_arguments if args.quick else arguments)):
+            line = format_result(result)
+            previous = baseline.get(record_key(result))
+            if previous is not None and previous['value']:
+                line += ' {:>+8.1f}%'.format(100.0 * (result['value'] / previous['value'] - 1.0))
+            print(line)
+            results.append(result)
+
+    write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import numpy
+
+from matcher import CACHE_SIZE, IntentMatcher, literal_prefixes
+
+THRESHOLD = 0.6  # Minimum share of the n-grams of an intent prototype that must occur in the input.
+
+
+def _ngrams(text):
+    """Returns the set of trigrams of the utf-8 encoded `text` padded with spaces, each packed into an integer.
+    """
+    padded = b' ' + text.encode('utf-8') + b' '
+    return set((padded[index] << 16) | (padded[index + 1] << 8) | padded[index + 2]
+               for index in range(len(padded) - 2))
+
+
+class IntentClassifier(IntentMatcher):
+    """Intent engine classifying whole batches of inputs with a single matrix product, with the interface of
+    `matcher.IntentMatcher`.
+
+    The regular expressions are tried first, so inputs they match keep their pattern. Only inputs that fall
+    through to the catch-all patterns, those without a literal prefix, are classified. Every other pattern is
+    represented by prototypes, the literal prefixes it requires (e.g. 'open' or 'please open'). Inputs and
+    prototypes become binary bags of byte trigrams over the trigrams of all prototypes, and every input is assigned
+    to the pattern of the prototype it contains the largest share of, the longest one on ties. The input must
+    begin with the words resembling the prototype, as the patterns are matched from the beginning, otherwise the
+    next closest prototype is tried. The words following them become the last group, e.g. 'plese open gate 2'
+    opens the gate 2. Inputs not close enough to any prototype keep the catch-all pattern.
+    """
+
+    def __init__(self, pairs, reflections=None, threshold=THRESHOLD, cache_size=CACHE_SIZE):
+        self._threshold = threshold
+        self._prototypes = []  # (pattern index, prototype text)
+        self._fallbacks = set()  # Indices of the catch-all patterns, which have no prototypes.
+        self._vocabulary = {}  # trigram -> column
+        self._weights = None   # Trigram rows by prototype columns, see `_build_weights`.
+        self._trigrams = None  # Sorted trigrams of the vocabulary and their columns, for batched lookups.
+        self._columns = None
+        IntentMatcher.__init__(self, pairs, reflections, cache_size)
+
+    def add(self, pattern, responses):
+        IntentMatcher.add(self, pattern, responses)
+        index = len(self._patterns) - 1
+        self._fallbacks.add(index)
+        for prefix in sorted(literal_prefixes(pattern, prune=False)):
+            prefix = prefix.strip()
+            if len(prefix) > 1 and (index, prefix) not in self._prototypes:
+                self._prototypes.append((index, prefix))
+                self._fallbacks.discard(index)
+                for ngram in _ngrams(prefix):
+                    self._vocabulary.setdefault(ngram, len(self._vocabulary))
+        self._weights = None
+
+    def _build_weights(self):
+        """Every prototype column holds `1 / n` for each of its `n` trigrams, plus a tiny bonus for its length,
+        so that multiplying a bag of trigrams gives the share of the prototype found in the input.
+        """
+        weights = numpy.zeros((len(self._vocabulary) + 1, len(self._prototypes)), dtype=numpy.float32)
+        for column, (_, prototype) in enumerate(self._prototypes):
+            ngrams = _ngrams(prototype)
+            for ngram in ngrams:
+                weights[self._vocabulary[ngram], column] = 1.0 / len(ngrams)
+            weights[-1, column] = len(prototype) * 1e-4
+        self._weights = weights
+        self._trigrams = numpy.array(sorted(self._vocabulary), dtype=numpy.int64)
+        self._columns = numpy.array([self._vocabulary[trigram] for trigram in self._trigrams.tolist()],
+                                    dtype=numpy.int64)
+
+    def _match(self, text):
+        return self.match_batch([text])[0]
+
+    def match_batch(self, texts):
+        """Returns `(index, groups)` or `None` for every input of `texts`, like `match` does for one input.
+        Repeated inputs are classified once, but results are not cached across batches.
+        """
+        if self._weights is None:
+            self._build_weights()
+        results = {}
+        unique = []  # Inputs left to the catch-all patterns by the regular expressions.
+        for text in dict.fromkeys(texts):
+            result = results[text] = IntentMatcher._match(self, text)
+            if result is None or result[0] in self._fallbacks:
+                unique.append(text)
+        if not unique or not self._prototypes:
+            return [results[text] for text in texts]
+
+        bags = numpy.zeros((len(unique), len(self._vocabulary) + 1), dtype=numpy.float32)
+        bags[:, -1] = 1.0
+
+        # Trigrams of all inputs at once: the padded inputs are joined by zero bytes, which never occur in
+        # prototypes, so trigrams spanning two inputs are never found in the vocabulary.
+        encoded = [b' ' + text.lower().encode('utf-8') + b' \0' for text in unique]
+        data = numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8).astype(numpy.int64)
+        trigrams = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+        rows = numpy.repeat(numpy.arange(len(unique)), [len(chunk) for chunk in encoded])[:len(trigrams)]
+        positions = numpy.minimum(numpy.searchsorted(self._trigrams, trigrams), len(self._trigrams) - 1)
+        found = self._trigrams[positions] == trigrams
+        bags[rows[found], self._columns[positions[found]]] = 1.0
+
+        scores = bags.dot(self._weights)
+        for text, row in zip(unique, scores):
+            # Prototypes close enough from the best down, until one is found at the beginning of the input.
+            for column in numpy.flatnonzero(row >= self._threshold)[numpy.argsort(-row[row >= self._threshold])]:
+                result = self._extract(text, *self._prototypes[column])
+                if result is not None:
+                    results[text] = result
+                    break
+        return [results[text] for text in texts]
+
+    def _extract(self, text, index, prototype):
+        """Returns `(index, groups)` for an input classified as the pattern `index`, or `None` unless the words
+        that resemble the `prototype` the most are at the beginning of the input and close enough to it.
+        """
+        match = self._patterns[index].match(text)
+        if match:
+            return index, match.groups()
+        words = text.split()
+        size = len(prototype.split())
+        ngrams = _ngrams(prototype)
+        windows = [_ngrams(' '.join(words[max(0, end - size):end]).lower())
+                   for end in range(min(size, len(words)), len(words) + 1)]
+        overlaps = [len(ngrams & window) for window in windows]
+        # Both the prototype and the leading words must mostly consist of shared trigrams, so that words inserted
+        # into the prototype do not pass as a typo.
+        if max(overlaps) > overlaps[0] or 2.0 * overlaps[0] < self._threshold * (len(ngrams) + len(windows[0])):
+            return None
+        end = min(size, len(words))
+        groups = [''] * self._patterns[index].groups
+        if groups:
+            groups[-1] = ' ' + ' '.join(words[end:]).rstrip('?!.')  # The argument follows the prototype.
+        return index, tuple(groups)
+
+    def respond_batch(self, texts):
+        """Returns the responses to all `texts`, `None` for inputs that do not match anything.
+        """
+        return [None if result is None else self.render(*result) for result in self.match_batch(texts)]
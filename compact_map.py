@@ -0,0 +1,356 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import mmap
+import struct
+import sys
+from array import array
+
+from map import DoorState, LayoutError, MapNames
+
+MAGIC = b'HALMAP01'
+HEADER = struct.Struct('<8s5I4x')  # Magic, rooms, doors, adjacency entries, room and door name bytes.
+
+
+class NameTable(object):
+    """Interns names to consecutive integer ids.
+    """
+
+    def __init__(self):
+        object.__init__(self)
+        self._names = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name):
+        """Returns the id of a newly interned `name`, or `None` if it is already known.
+        """
+        if name in self._ids:
+            return None
+        index = self._ids[name] = len(self._names)
+        self._names.append(name)
+        return index
+
+    def id(self, name):
+        return self._ids.get(name)
+
+    def name(self, index):
+        return self._names[index]
+
+
+class PackedNameTable(object):
+    """Read-only name table stored in a memory-mapped layout: name offsets, utf-8 names and the ids sorted by name,
+    so that names are looked up with a binary search instead of being parsed into a dictionary.
+    """
+
+    def __init__(self, offsets, blob, order):
+        object.__init__(self)
+        self._offsets = offsets
+        self._blob = blob
+        self._order = order
+
+    def __len__(self):
+        return len(self._order)
+
+    def add(self, name):
+        raise TypeError('memory-mapped layouts are read-only')
+
+    def _key(self, index):
+        return self._blob[self._offsets[index]:self._offsets[index + 1]].tobytes()
+
+    def id(self, name):
+        key = name.encode('utf-8')
+        low, high = 0, len(self._order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(self._order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._order) and self._key(self._order[low]) == key:
+            return self._order[low]
+        return None
+
+    def name(self, index):
+        return self._key(index).decode('utf-8')
+
+
+class CompactRoom(object):
+    """Lightweight view of a room of a `CompactMap`, with the same interface as `map.Room`.
+    """
+
+    __slots__ = ('_map', '_id')
+
+    def __init__(self, ship, index):
+        self._map = ship
+        self._id = index
+
+    def id(self):
+        return self._id
+
+    def name(self):
+        return self._map._rooms.name(self._id)
+
+    def possible_transitions(self):
+        ship = self._map
+        transitions = {}
+        for neighbour, door in ship.adjacency(self._id):
+            transitions.setdefault(ship._rooms.name(neighbour), []).append(ship._doors.name(door))
+        return transitions
+
+    def get_doors(self, to_room=None):
+        ship = self._map
+        if to_room is None:
+            return [ship._doors.name(door) for _, door in ship.adjacency(self._id)]
+        to_room = ship._rooms.id(to_room)
+        return [ship._doors.name(door) for neighbour, door in ship.adjacency(self._id) if neighbour == to_room]
+
+
+class CompactDoor(object):
+    """Lightweight view of a door of a `CompactMap`, with the same interface as `map.Door`.
+    """
+
+    __slots__ = ('_map', '_id')
+
+    def __init__(self, ship, index):
+        self._map = ship
+        self._id = index
+
+    def id(self):
+        return self._id
+
+    def name(self):
+        return self._map._doors.name(self._id)
+
+    def state(self):
+        return self._map._door_states[self._id]
+
+    def set_state(self, state):
+        self._map.set_door_state(self._id, state)
+
+    def between(self):
+        ship = self._map
+        return ship._rooms.name(ship._door_rooms[2 * self._id]), ship._rooms.name(ship._door_rooms[2 * self._id + 1])
+
+
+class CompactMap(MapNames):
+    """Alternative to `map.Map` for very large ships.
+
+    Room and door names are interned to integer ids, door states live in a `bytearray` and the adjacency is
+    stored in CSR arrays (offsets, neighbour ids, door ids) that are rebuilt lazily after the layout changes.
+    Rooms and doors are returned as `CompactRoom` and `CompactDoor` views created on demand.
+    """
+
+    def __init__(self):
+        MapNames.__init__(self)
+        self._rooms = NameTable()
+        self._doors = NameTable()
+        self._door_rooms = array('i')  # Two room ids per door.
+        self._door_states = bytearray()
+        self._offsets = None
+        self._neighbours = None
+        self._via = None
+        self._listeners = []
+
+    def add_room(self, name):
+        if self.check_room(name) is not None:  # Every room must have a name and must be unique
+            return False
+        self._rooms.add(name)
+        self._offsets = None
+        self._name_added(name, True)
+        return True
+
+    def add_rooms(self, rooms):
+        for room in rooms:
+            self.add_room(room)
+
+    def add_door(self, door_name, room1, room2):
+        if self.check_door(door_name, room1, room2) is not None:
+            return False  # Every door must have a name, must be unique and must lead to existing rooms
+        room1, room2 = self._rooms.id(room1), self._rooms.id(room2)
+        self._doors.add(door_name)
+        self._door_rooms.append(room1)
+        self._door_rooms.append(room2)
+        self._door_states.append(DoorState.CLOSED)
+        self._offsets = None
+        self._name_added(door_name, False)
+        return True
+
+    def get_room(self, name):
+        index = self._rooms.id(name)
+        return None if index is None else CompactRoom(self, index)
+
+    def get_door(self, name):
+        index = self._doors.id(name)
+        return None if index is None else CompactDoor(self, index)
+
+    def _room_names(self):
+        return (self._rooms.name(index) for index in range(len(self._rooms)))
+
+    def _door_names(self):
+        return (self._doors.name(index) for index in range(len(self._doors)))
+
+    def rooms(self):
+        return (CompactRoom(self, index) for index in range(len(self._rooms)))
+
+    def doors(self):
+        return (CompactDoor(self, index) for index in range(len(self._doors)))
+
+    def room_count(self):
+        return len(self._rooms)
+
+    def door_count(self):
+        return len(self._doors)
+
+    def set_door_state(self, door, state):
+        if state in (DoorState.CLOSED, DoorState.OPEN) and state != self._door_states[door]:
+            self._door_states[door] = state
+            if self._listeners:
+                view = CompactDoor(self, door)
+                for listener in self._listeners:
+                    listener(view)
+
+    def adjacency(self, room):
+        """Yields `(neighbour_id, door_id)` pairs of the room with the id `room`, in the order doors were added.
+        """
+        if self._offsets is None:
+            self._build_adjacency()
+        neighbours, via = self._neighbours, self._via
+        for position in range(self._offsets[room], self._offsets[room + 1]):
+            yield neighbours[position], via[position]
+
+    def _build_adjacency(self):
+        rooms_count = len(self._rooms)
+        door_rooms = self._door_rooms
+
+        offsets = array('i', bytes(4 * (rooms_count + 1)))
+        for room in door_rooms:
+            offsets[room + 1] += 1
+        for door in range(len(self._doors)):
+            room1, room2 = door_rooms[2 * door], door_rooms[2 * door + 1]
+            if room1 == room2:  # Such door does not lead anywhere, the same way `map.Room` ignores it.
+                offsets[room1 + 1] -= 2
+        for room in range(rooms_count):
+            offsets[room + 1] += offsets[room]
+
+        free = array('i', offsets[:-1])
+        neighbours = array('i', bytes(4 * offsets[-1]))
+        via = array('i', bytes(4 * offsets[-1]))
+        for door in range(len(self._doors)):
+            room1, room2 = door_rooms[2 * door], door_rooms[2 * door + 1]
+            if room1 != room2:
+                for room, neighbour in ((room1, room2), (room2, room1)):
+                    neighbours[free[room]] = neighbour
+                    via[free[room]] = door
+                    free[room] += 1
+
+        self._offsets, self._neighbours, self._via = offsets, neighbours, via
+
+    def add_listener(self, listener):
+        """Registers `listener(door)` to be called every time a door on the map changes its state.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    @staticmethod
+    def from_map(ship):
+        """Copies rooms, doors and door states of any map with `rooms()` and `doors()` into a new `CompactMap`.
+        """
+        compact = CompactMap()
+        compact.add_rooms(room.name() for room in ship.rooms())
+        for door in ship.doors():
+            room1, room2 = door.between()
+            compact.add_door(door.name(), room1, room2)
+            compact.get_door(door.name()).set_state(door.state())
+        return compact
+
+    def save(self, path):
+        """Writes the layout and door states into a binary file that `CompactMap.load` can memory-map.
+        """
+        if self._offsets is None:
+            self._build_adjacency()
+
+        tables = []
+        for names in (self._rooms, self._doors):
+            encoded = [names.name(index).encode('utf-8') for index in range(len(names))]
+            offsets = array('i', [0])
+            for name in encoded:
+                offsets.append(offsets[-1] + len(name))
+            order = array('i', sorted(range(len(encoded)), key=encoded.__getitem__))
+            tables.append((offsets, order, b''.join(encoded)))
+
+        with open(path, 'wb') as stream:
+            stream.write(HEADER.pack(MAGIC, len(self._rooms), len(self._doors), len(self._neighbours),
+                                     len(tables[0][2]), len(tables[1][2])))
+            for values in (self._offsets, self._neighbours, self._via, self._door_rooms,
+                           tables[0][0], tables[0][1], tables[1][0], tables[1][1]):
+                stream.write(_little_endian(array('i', values)))
+            stream.write(bytes(self._door_states))
+            stream.write(tables[0][2])
+            stream.write(tables[1][2])
+
+    @staticmethod
+    def load(path):
+        """Memory-maps a file written by `CompactMap.save`. Nothing but the header is parsed, names are looked up
+        directly in the mapping. The layout is read-only, door states are copied so they can still change.
+        """
+        with open(path, 'rb') as stream:
+            header = stream.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise LayoutError(None, 'truncated compiled layout, {} of {} bytes'.format(len(header), HEADER.size))
+            data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rooms, doors, entries, room_bytes, door_bytes = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise LayoutError(None, 'not a compiled ship layout')
+        if sys.byteorder != 'little':
+            raise ValueError('compiled ship layouts can only be mapped on little-endian machines')
+        counts = (rooms + 1, entries, entries, 2 * doors, rooms + 1, rooms, doors + 1, doors)
+        size = HEADER.size + 4 * sum(counts) + doors + room_bytes + door_bytes
+        if len(data) < size:
+            message = 'truncated compiled layout, {} of {} bytes'.format(len(data), size)
+            data.close()
+            raise LayoutError(None, message)
+
+        view = memoryview(data)
+        position = HEADER.size
+        sections = []
+        for count in counts:
+            sections.append(view[position:position + 4 * count].cast('i'))
+            position += 4 * count
+        offsets, neighbours, via, door_rooms, room_offsets, room_order, door_offsets, door_order = sections
+        states = view[position:position + doors]
+        position += doors
+        room_blob = view[position:position + room_bytes]
+        door_blob = view[position + room_bytes:position + room_bytes + door_bytes]
+
+        ship = MappedMap()
+        ship._rooms = PackedNameTable(room_offsets, room_blob, room_order)
+        ship._doors = PackedNameTable(door_offsets, door_blob, door_order)
+        ship._door_rooms = door_rooms
+        ship._door_states = bytearray(states)
+        ship._offsets, ship._neighbours, ship._via = offsets, neighbours, via
+        ship._mapping = data
+        return ship
+
+
+class MappedMap(CompactMap):
+    """`CompactMap` backed by a memory-mapped layout file, see `CompactMap.load`. Rooms and doors can not be added.
+    """
+
+    def add_room(self, name):
+        raise TypeError('memory-mapped layouts are read-only')
+
+    def add_door(self, door_name, room1, room2):
+        raise TypeError('memory-mapped layouts are read-only')
+
+
+def _little_endian(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
@@ -0,0 +1,137 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import numpy
+
+from map import DoorState
+
+STATIONS = 64       # Rooms the crew walks between, next hops are tabled for every one of them.
+RESTLESSNESS = 0.1  # Chance per step that a crew member who arrived, or whose way is shut, picks another station.
+
+
+class Crew(object):
+    """Crew members walking between rooms of a map, all of them advanced at once by `step`.
+
+    Rooms and doors get integer ids when the crew is created, the layout is assumed not to change afterwards.
+    Every crew member has a position and a destination, one of a few `stations` rooms, in NumPy arrays. Per
+    station, a table holds the next room on a shortest way through open doors from every room. The tables are
+    built with one breadth-first search from all stations at once, vectorized over the CSR adjacency of the
+    open doors, and rebuilt on the next step after a door changed. Each step moves everyone who is on the way one
+    room further; who arrived or can not go on waits, and picks another station with the chance `restlessness`.
+    The number of crew members per room is updated with the moves only.
+    """
+
+    def __init__(self, ship, size, stations=STATIONS, restlessness=RESTLESSNESS, seed=0):
+        object.__init__(self)
+        self._map = ship
+        self._random = numpy.random.default_rng(seed)
+        self._restlessness = restlessness
+
+        self._names = [room.name() for room in ship.rooms()]
+        self._ids = dict((name, index) for index, name in enumerate(self._names))
+        doors = list(ship.doors())
+        self._door_ids = dict((door.name(), index) for index, door in enumerate(doors))
+        self._door_rooms = numpy.array([[self._ids[room] for room in door.between()] for door in doors],
+                                       dtype=numpy.int32).reshape(-1, 2)
+        self._open = numpy.array([door.state() == DoorState.OPEN for door in doors], dtype=bool)
+        self._next_hops = None  # Stations by rooms, -1 where a station can not be reached, see `_build_next_hops`.
+
+        rooms = len(self._names)
+        self._stations = self._random.choice(rooms, min(stations, rooms), replace=False).astype(numpy.int32)
+        self.positions = self._random.integers(0, rooms, size, dtype=numpy.int32)
+        self.destinations = self._random.integers(0, len(self._stations), size, dtype=numpy.int32)
+        self._occupancy = numpy.bincount(self.positions, minlength=rooms)
+        ship.add_listener(self._on_door_state_changed)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def close(self):
+        """Stops following the door changes of the map.
+        """
+        self._map.remove_listener(self._on_door_state_changed)
+
+    def _on_door_state_changed(self, door):
+        index = self._door_ids.get(door.name())
+        if index is not None:
+            self._open[index] = door.state() == DoorState.OPEN
+            self._next_hops = None
+
+    def _build_next_hops(self):
+        """Breadth-first search from every station at once over the doors that are open. A search state is a
+        station and a room packed into one integer, and the next hop of a room towards the station is one of the
+        rooms one level closer to it, through which the search reached the room.
+        """
+        rooms = len(self._names)
+        pairs = self._door_rooms[self._open]
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        sources = numpy.concatenate((pairs[:, 0], pairs[:, 1]))
+        neighbours = numpy.concatenate((pairs[:, 1], pairs[:, 0]))[numpy.argsort(sources, kind='stable')]
+        offsets = numpy.zeros(rooms + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(sources, minlength=rooms), out=offsets[1:])
+
+        next_hops = numpy.full(len(self._stations) * rooms, -1, dtype=numpy.int32)
+        latest = numpy.empty(len(self._stations) * rooms, dtype=numpy.int32)
+        frontier = numpy.arange(len(self._stations), dtype=numpy.int64) * rooms + self._stations
+        next_hops[frontier] = self._stations
+        while len(frontier):
+            station, room = numpy.divmod(frontier, rooms)
+            starts, counts = offsets[room], offsets[room + 1] - offsets[room]
+            total = int(counts.sum())
+            if not total:
+                break
+            # Positions of all adjacency entries of the frontier rooms, one run of `counts` per room.
+            runs = numpy.repeat(numpy.cumsum(counts) - counts, counts)
+            positions = numpy.repeat(starts, counts) + numpy.arange(total) - runs
+            found = numpy.repeat(station * rooms, counts) + neighbours[positions]
+            fresh = next_hops[found] < 0
+            found, via = found[fresh], numpy.repeat(room, counts)[fresh]
+            # A state found from several rooms keeps the last of them, and enters the next frontier once.
+            next_hops[found] = via
+            index = numpy.arange(len(found), dtype=numpy.int32)
+            latest[found] = index
+            frontier = found[latest[found] == index]
+        self._next_hops = next_hops.reshape(len(self._stations), rooms)
+
+    def step(self):
+        """Moves every crew member on the way one room towards its destination. Returns the number of moves.
+        """
+        if self._next_hops is None:
+            self._build_next_hops()
+        hops = self._next_hops[self.destinations, self.positions]
+        moving = (hops >= 0) & (hops != self.positions)
+        waiting = numpy.flatnonzero(~moving)
+        restless = waiting[self._random.random(len(waiting)) < self._restlessness]
+        self.destinations[restless] = self._random.integers(0, len(self._stations), len(restless),
+                                                            dtype=numpy.int32)
+
+        rooms = len(self._names)
+        moved = numpy.flatnonzero(moving)
+        self._occupancy -= numpy.bincount(self.positions[moved], minlength=rooms)
+        self.positions[moved] = hops[moved]
+        self._occupancy += numpy.bincount(self.positions[moved], minlength=rooms)
+        return len(moved)
+
+    def count(self, room_name):
+        """Returns the number of crew members in the room called `room_name`, 0 for unknown rooms.
+        """
+        room = self._ids.get(room_name)
+        return 0 if room is None else int(self._occupancy[room])
+
+    def members(self, room_name):
+        """Returns the ids of the crew members in the room called `room_name` in ascending order.
+        """
+        room = self._ids.get(room_name)
+        if room is None or not self._occupancy[room]:
+            return []
+        return numpy.flatnonzero(self.positions == room).tolist()
+
+    def busiest(self, count):
+        """Returns `(room name, crew members)` of the `count` most crowded rooms, most crowded first.
+        """
+        count = min(count, len(self._names))
+        rooms = numpy.argpartition(-self._occupancy, count - 1)[:count] if count else []
+        rooms = sorted(rooms, key=lambda room: (-self._occupancy[room], self._names[room]))
+        return [(self._names[room], int(self._occupancy[room])) for room in rooms if self._occupancy[room]]
@@ -0,0 +1,131 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+from array import array
+
+import numpy
+
+POSTINGS_BUDGET = 20000  # Posting list entries counted per lookup, the most common trigrams are skipped beyond it.
+CANDIDATES = 64           # Names sharing the most trigrams with the query that are compared letter by letter.
+
+
+def max_distance(name):
+    """Number of typos tolerated in a `name`, one per four letters.
+    """
+    return max(1, len(name) // 4)
+
+
+def distance(first, second):
+    """Levenshtein distance between two strings, computed with the bit-parallel algorithm of Myers and Hyyro.
+    """
+    if not first:
+        return len(second)
+    masks = {}
+    for position, char in enumerate(first):
+        masks[char] = masks.get(char, 0) | (1 << position)
+
+    full = (1 << len(first)) - 1
+    last = 1 << (len(first) - 1)
+    positive, negative, score = full, 0, len(first)
+    for char in second:
+        equal = masks.get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        horizontal_positive = negative | (~(horizontal | positive) & full)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            score += 1
+        elif horizontal_negative & last:
+            score -= 1
+        horizontal_positive = ((horizontal_positive << 1) | 1) & full
+        horizontal_negative = (horizontal_negative << 1) & full
+        positive = horizontal_negative | (~(vertical | horizontal_positive) & full)
+        negative = horizontal_positive & vertical
+    return score
+
+
+def closest(name, names):
+    """Returns the one of a few `names` closest to the `name`, or `None` if all of them are too different.
+    """
+    query = name.lower()
+    best, best_distance = None, max_distance(query) + 1
+    for candidate in names:
+        candidate_distance = distance(query, candidate.lower())
+        if candidate_distance < best_distance:
+            best, best_distance = candidate, candidate_distance
+    return best
+
+
+def _trigrams(name):
+    padded = '\x02\x02' + name + '\x03'
+    return set(padded[index:index + 3] for index in range(len(padded) - 2))
+
+
+class FuzzyIndex(object):
+    """Trigram index of names for typo-tolerant lookups on large ships.
+
+    Every lookup counts the trigrams names share with the query over the shortest posting lists, within
+    `POSTINGS_BUDGET` entries. Only the `CANDIDATES` names of a similar length sharing the most trigrams are
+    then ranked by their edit distance to the query.
+    """
+
+    def __init__(self, names=()):
+        object.__init__(self)
+        self._names = []
+        self._lengths = array('i')
+        self._postings = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name):
+        index = len(self._names)
+        self._names.append(name)
+        self._lengths.append(len(name))
+        for trigram in _trigrams(name.lower()):
+            postings = self._postings.get(trigram)
+            if postings is None:
+                postings = self._postings[trigram] = array('i')
+            postings.append(index)
+
+    def find(self, name):
+        """Returns the indexed name closest to `name`, or `None` if no name is within `max_distance` typos.
+        """
+        query = name.lower()
+        trigrams = sorted((trigram for trigram in _trigrams(query) if trigram in self._postings),
+                          key=lambda trigram: len(self._postings[trigram]))
+        if not trigrams:
+            return None
+
+        # Posting lists are counted in place, views of them must not outlive the lookup or they could not grow.
+        selected = [numpy.frombuffer(self._postings[trigrams[0]], dtype=numpy.int32)]
+        total = len(selected[0])
+        for trigram in trigrams[1:]:
+            total += len(self._postings[trigram])
+            if total > POSTINGS_BUDGET:
+                break
+            selected.append(numpy.frombuffer(self._postings[trigram], dtype=numpy.int32))
+
+        # Every typo removes at most three of the query trigrams, so names sharing fewer can not be close enough.
+        limit = max_distance(query)
+        indices, counts = numpy.unique(numpy.concatenate(selected), return_counts=True)
+        enough = counts >= max(1, len(selected) - 3 * limit)
+        indices, counts = indices[enough], counts[enough]
+        similar = numpy.abs(numpy.frombuffer(self._lengths, dtype=numpy.int32)[indices] - len(query)) <= limit
+        indices, counts = indices[similar], counts[similar]
+        if len(indices) > CANDIDATES:
+            best = numpy.argpartition(-counts, CANDIDATES)[:CANDIDATES]
+            indices, counts = indices[best], counts[best]
+
+        best, best_distance = None, limit + 1
+        for count, index in sorted(zip((-counts).tolist(), indices.tolist())):
+            if -count < len(selected) - 3 * (best_distance - 1):
+                break  # Neither this nor any of the following names can be closer than the best one.
+            candidate_distance = distance(query, self._names[index].lower())
+            if candidate_distance < best_distance:
+                best, best_distance = self._names[index], candidate_distance
+        return best
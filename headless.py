@@ -0,0 +1,139 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Replays recorded transcripts through HAL9000 without a window.
+
+Every transcript is a text file with one user input per line, lines starting with `/` are commands and `/quit`
+ends the transcript. Responses are written as JSON lines, one object per input:
+
+    {"transcript": "day1.txt", "line": 3, "input": "open gate 1",
+     "responses": [{"text": "The gate 1 is now open.", "align": "right", "color": "#00805A"}]}
+
+    python headless.py day1.txt day2.txt --jobs 4 --output responses.jsonl
+"""
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from compact_map import CompactMap
+from layout import LayoutError
+from main import HAL9000, create_ship
+from map import Map
+from worker import BufferedTerminal
+
+TextEvent = collections.namedtuple('TextEvent', 'text')
+
+
+def replay(name, lines, ship, seed=None, chatbot=None):
+    """Feeds transcript `lines` to a new HAL9000 on the `ship` and yields one response record per input.
+    """
+    if seed is not None:
+        random.seed(seed)
+    terminal = BufferedTerminal()
+    agent = HAL9000(terminal, ship, chatbot)
+    ended = []
+    agent.on_quit = lambda: ended.append(True)  # E.g. `/after 0 quit`, the transcript ends after the response.
+
+    for line_number, line in enumerate(lines, 1):
+        text = line.rstrip('\r\n')
+        if not text.strip():
+            continue
+        if text.split()[0] == '/quit':
+            break
+        if text.startswith('/'):
+            agent.on_command(TextEvent(text[1:]))
+        else:
+            agent.on_input(TextEvent(text))
+        agent.update(None)  # Actions that became due meanwhile, e.g. scheduled by `/after 0 ...`.
+        yield {'transcript': name, 'line': line_number, 'input': text, 'responses': terminal.flush()}
+        if ended:
+            break
+
+
+def _replay_file(job):
+    """Worker of the process pool: replays a whole transcript into the file `part` as it goes, and returns the
+    number of records written.
+    """
+    path, layout, map_class, seed, classifier, part = job
+    chatbot = HAL9000.create_chatbot(classifier)
+    records = 0
+    with open(path, 'r', encoding='utf-8') as stream, open(part, 'w', encoding='utf-8') as output:
+        for record in replay(path, stream, create_ship(layout, map_class), seed, chatbot):
+            output.write(json.dumps(record) + '\n')
+            records += 1
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay transcripts through HAL9000 without a window.')
+    parser.add_argument('transcripts', nargs='+', help='transcript files, `-` reads standard input')
+    parser.add_argument('--output', help='write responses here instead of the standard output')
+    parser.add_argument('--jobs', type=int, default=1, help='replay transcripts in this many processes')
+    parser.add_argument('--layout', help='load the ship from a text or compiled layout file')
+    parser.add_argument('--compact-map', action='store_true', help='use the array-backed map for large ships')
+    parser.add_argument('--seed', type=int, help='seed the random responses of every transcript')
+    parser.add_argument('--classifier', action='store_true', help='use the n-gram intent classifier')
+    args = parser.parse_args()
+
+    map_class = CompactMap if args.compact_map else Map
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    utterances = 0
+    started = time.time()
+
+    try:
+        if args.jobs > 1:
+            if '-' in args.transcripts:
+                parser.error('the standard input can not be sharded')
+            if args.layout:
+                create_ship(args.layout, map_class)  # Reports layout errors once, before any shard starts.
+            # Every shard is written to its own file, which is appended to the output once the shards before it
+            # are, so memory use does not grow with the length of the transcripts.
+            parts = tempfile.mkdtemp(prefix='headless-')
+            try:
+                pool = multiprocessing.Pool(args.jobs)
+                jobs = [(path, args.layout, map_class, args.seed, args.classifier,
+                         os.path.join(parts, '{}.jsonl'.format(number)))
+                        for number, path in enumerate(args.transcripts)]
+                for job, records in zip(jobs, pool.imap(_replay_file, jobs)):
+                    with open(job[-1], 'r', encoding='utf-8') as part:
+                        shutil.copyfileobj(part, output)
+                    os.remove(job[-1])
+                    utterances += records
+                pool.close()
+                pool.join()
+            finally:
+                shutil.rmtree(parts, ignore_errors=True)
+
+        else:
+            chatbot = HAL9000.create_chatbot(args.classifier)
+            for path in args.transcripts:
+                stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+                for record in replay(path, stream, create_ship(args.layout, map_class), args.seed, chatbot):
+                    output.write(json.dumps(record) + '\n')
+                    utterances += 1
+                if stream is not sys.stdin:
+                    stream.close()
+
+    except LayoutError as error:
+        parser.exit(1, '{}:{}\n'.format(args.layout, error))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.time() - started
+    sys.stderr.write('{} utterances in {:.2f}s, {:.0f} utterances/s\n'.format(
+        utterances, elapsed, utterances / elapsed if elapsed > 0 else 0.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Persists door states and the location of the operator across restarts.
+
+Changes are appended to `journal.jsonl` in the journal directory, one JSON object per line with a sequence number:
+
+    {"seq": 41, "door": "gate 1", "state": "open"}
+    {"seq": 42, "location": "main corridor"}
+
+Every `snapshot_interval` changes, the whole state is written to `snapshot.json` and the journal starts over, so
+restoring only has to load the snapshot and replay the changes made after it.
+"""
+
+import json
+import os
+import queue
+import threading
+
+from map import DoorState
+
+JOURNAL_FILE = 'journal.jsonl'
+SNAPSHOT_FILE = 'snapshot.json'
+
+
+class Journal(object):
+    """Append-only journal of state changes. Changes are queued by the caller and written in batches by a
+    background thread, which also writes the snapshots, so recording a change never waits for the disk.
+    """
+
+    def __init__(self, directory, snapshot_interval=1000):
+        object.__init__(self)
+        self._directory = directory
+        self._snapshot_interval = snapshot_interval
+        self._sequence = 0
+        self._doors = {}  # Door states changed since the layout was loaded, including changes before restarts.
+        self._location = None
+        self._snapshot_sequence = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, name):
+        return os.path.join(self._directory, name)
+
+    def restore(self, ship):
+        """Applies the latest snapshot and the changes journaled after it to the `ship`, and returns the name of
+        the last location of the operator, or `None`. Must be called before any new changes are recorded.
+        """
+        if os.path.exists(self._path(SNAPSHOT_FILE)):
+            with open(self._path(SNAPSHOT_FILE), 'r', encoding='utf-8') as stream:
+                snapshot = json.load(stream)
+            self._snapshot_sequence = self._sequence = snapshot['seq']
+            self._location = snapshot['location']
+            self._doors.update((name, DoorState.from_str(state)) for name, state in snapshot['doors'].items())
+
+        if os.path.exists(self._path(JOURNAL_FILE)):
+            with open(self._path(JOURNAL_FILE), 'rb+') as stream:
+                complete = 0
+                for line in stream:
+                    if not line.endswith(b'\n'):
+                        break  # The last change could only be written partially before a crash.
+                    record = json.loads(line.decode('utf-8'))
+                    if record['seq'] > self._sequence:
+                        self._sequence = record['seq']
+                        self._apply(record)
+                    complete += len(line)
+                stream.truncate(complete)  # New changes must not be appended to a partial line.
+
+        for name, state in self._doors.items():
+            door = ship.get_door(name)
+            if door is not None:
+                door.set_state(state)
+        return self._location
+
+    def _apply(self, record):
+        if 'door' in record:
+            self._doors[record['door']] = DoorState.from_str(record['state'])
+        else:
+            self._location = record['location']
+
+    def on_door_state_changed(self, door):
+        """Map listener recording the new state of the `door`.
+        """
+        self._record({'door': door.name(), 'state': DoorState.to_str(door.state())})
+
+    def on_relocated(self, room):
+        """Agent listener recording the new location of the operator.
+        """
+        self._record({'location': room.name()})
+
+    def _record(self, record):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write_changes)
+            self._thread.daemon = True
+            self._thread.start()
+        self._sequence += 1
+        record['seq'] = self._sequence
+        self._queue.put(record)
+
+    def _write_changes(self):
+        stream = open(self._path(JOURNAL_FILE), 'a', encoding='utf-8')
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while not self._queue.empty():
+                    batch.append(self._queue.get())
+                closing = batch[-1] is None
+                if closing:
+                    batch.pop()
+
+                for record in batch:
+                    stream.write(json.dumps(record) + '\n')
+                    self._apply(record)
+                stream.flush()
+
+                if batch and batch[-1]['seq'] - self._snapshot_sequence >= self._snapshot_interval:
+                    self._write_snapshot(batch[-1]['seq'])
+                    stream.close()
+                    stream = open(self._path(JOURNAL_FILE), 'w', encoding='utf-8')
+                if closing:
+                    break
+        finally:
+            stream.close()
+
+    def _write_snapshot(self, sequence):
+        """Replaces the snapshot atomically, changes still in the journal are skipped when restoring it.
+        """
+        snapshot = {'seq': sequence, 'location': self._location,
+                    'doors': dict((name, DoorState.to_str(state)) for name, state in self._doors.items())}
+        temporary = self._path(SNAPSHOT_FILE + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as stream:
+            json.dump(snapshot, stream)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temporary, self._path(SNAPSHOT_FILE))
+        self._snapshot_sequence = sequence
+
+    def close(self):
+        """Writes all queued changes and stops the writer thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,104 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Loads ship layouts from files.
+
+Text layouts are JSON lines, one room or door per line; blank lines and lines starting with `#` are skipped:
+
+    {"room": "kitchen"}
+    {"door": "gate 4", "between": ["main corridor", "kitchen"], "state": "open"}
+
+Compiled layouts are written by `CompactMap.save` and memory-mapped by `CompactMap.load`:
+
+    python layout.py compile ship.jsonl ship.halmap
+"""
+
+import argparse
+import json
+
+from compact_map import MAGIC, CompactMap
+from map import DoorState, LayoutError, Map
+
+
+def load_text_layout(lines, ship=None):
+    """Applies the text layout `lines` to `ship` (a new `map.Map` by default) in a single pass and returns it.
+    """
+    if ship is None:
+        ship = Map()
+
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise LayoutError(line_number, 'invalid JSON ({})'.format(error))
+        if not isinstance(record, dict):
+            raise LayoutError(line_number, 'expected a JSON object')
+
+        rooms = record.get('between')
+        names = [record.get('room'), record.get('door')] + (rooms if isinstance(rooms, list) else [])
+        if not all(name is None or isinstance(name, str) for name in names):
+            raise LayoutError(line_number, 'names must be strings')
+
+        if 'room' in record:
+            error = ship.check_room(record['room'])
+            if error is not None:
+                raise LayoutError(line_number, error)
+            ship.add_room(record['room'])
+
+        elif 'door' in record:
+            if not isinstance(rooms, list) or len(rooms) != 2:
+                raise LayoutError(line_number, 'door must be between exactly two rooms')
+            state = DoorState.from_str(record.get('state', 'closed'))
+            if state is None:
+                raise LayoutError(line_number, 'unknown door state \'{}\''.format(record['state']))
+            error = ship.check_door(record['door'], rooms[0], rooms[1])
+            if error is not None:
+                raise LayoutError(line_number, error)
+            ship.add_door(record['door'], rooms[0], rooms[1])
+            if state != DoorState.CLOSED:
+                ship.get_door(record['door']).set_state(state)
+
+        else:
+            raise LayoutError(line_number, 'expected a "room" or a "door"')
+
+    return ship
+
+
+def load_layout(path, map_class=Map):
+    """Loads either a compiled or a text layout from `path`, telling them apart by the compiled file signature.
+    Text layouts are loaded into a new `map_class` instance, compiled ones are always memory-mapped.
+    """
+    with open(path, 'rb') as stream:
+        compiled = stream.read(len(MAGIC)) == MAGIC
+
+    if compiled:
+        return CompactMap.load(path)
+
+    with open(path, 'r', encoding='utf-8') as stream:
+        return load_text_layout(stream, map_class())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile text ship layouts into memory-mappable files.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    compile_parser = subparsers.add_parser('compile', help='compile a text layout')
+    compile_parser.add_argument('source')
+    compile_parser.add_argument('target')
+    args = parser.parse_args()
+
+    try:
+        ship = load_layout(args.source, CompactMap)
+    except LayoutError as error:
+        parser.exit(1, '{}:{}\n'.format(args.source, error))
+    ship.save(args.target)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,40 @@
 # Copyright (c) 2015, AiGameDev.com KG.
 #
 
-import vispy                    # Main application support.
+import time
 
-import window                   # Terminal input and display.
+STARTED = time.perf_counter()   # Start of the process, for `--profile-startup`.
 
-from datetime import datetime
+import argparse
+import heapq
+import math
+import sys
+import threading
+import traceback
+import vispy                    # Main application support.
 
-import nltk  # Chat-bot
+from datetime import datetime
 
 from map import Map, DoorState
+from compact_map import CompactMap
+from crew import Crew
+from fuzzy import closest
+from journal import Journal
+from reachability import Reachability
+from layout import LayoutError, load_layout
+from matcher import IntentMatcher
+from routing import RoutePlanner
+from scheduler import Scheduler
+from stats import LatencyRecorder
+from trie import Trie
+from worker import AgentWorker, BufferedTerminal
+
+
+REACHABLE_LISTED = 10  # Number of reachable rooms named in answers, the rest are only counted.
+COMPLETIONS = 10       # Number of candidates offered by `HAL9000.complete`.
+CREW_LISTED = 10       # Number of crew members and rooms named in answers about the crew.
+CREW_STEP_INTERVAL = 1.0  # Seconds between steps of the crew, see `HAL9000.add_crew`.
+UPDATE_INTERVAL = 0.25    # Seconds between calls to `HAL9000.update` while actions are scheduled.
 
 
 class HAL9000(object):
@@ -36,10 +61,12 @@ class HAL9000(object):
         (r'(hi|hello|hey)[\,\s\.\!]*', _greetings),
         (r'good (morning|day|evening|night)', _greetings),
         (r'where am i\?*', ['You are in the ${location} now.']),
+        (r'(who is in the|who is in|who is at the|who is at)([\w\s]+)\?*', ['${execute} who %2']),
         (r'(open|please, open|please open)([\w\s]+)', ['${execute} open %2']),
         (r'(close|please, close|please close)([\w\s]+)', ['${execute} close %2']),
         (r'(where can i go|where to go)\?*', ['${execute} transitions']),
         (r'(how can i get to the|how can i get to)([\w\s]+)\?', ['${execute} where %2']),
+        (r'(can i get to the|can i get to|can i reach the|can i reach)([\w\s]+)\?*', ['${execute} reachable %2']),
         (r'(take me to the|take me to|go to the|go to|relocate to the|relocate to|i want to go to the|i want to go to|'
          r'i want to get to the|i want to get to|get to the|get to)([\w\s]+)', ['${execute} goto %2']),
         (r'(ok|o\.k\.|fine|excellent|cool)', ['Good.', 'Do you think so?', 'Awesome.', 'Perfect.']),
@@ -48,44 +75,88 @@ class HAL9000(object):
         (r'', _default_responses)
     ]
     
-    def __init__(self, terminal):
+    update_interval = None  # Seconds between calls to `update`, `None` while the agent has nothing to update.
+
+    def __init__(self, terminal, ship=None, chatbot=None, stats=None, location=None, reachability=None):
         """Constructor for the agent, stores references to systems and initializes internal memory.
+        Without a `ship` the default layout is created on a new `map.Map`. The `ship` and the `chatbot` can be
+        shared by many agents, see `HAL9000.create_chatbot` and `map.MapOverlay`. Latencies of inputs and commands
+        are only measured if a `stats.LatencyRecorder` is given. The operator starts in the `location` room, e.g.
+        restored by a `journal.Journal`, or in the start location. The regions of the ship are labelled on the
+        first question about them unless a `reachability.Reachability` of the `ship` is given.
         """
         self._terminal = terminal
-        self._map = Map()
-        self._create_map()
-        self._location = self._map.get_room('start location')
-        self._chatbot = nltk.chat.Chat(HAL9000._responses, nltk.chat.util.reflections)
+        self._map = ship if ship is not None else HAL9000._create_map(Map())
+        self._location = ((location and self._map.get_room(location)) or self._map.get_room('start location') or
+                          next(iter(self._map.rooms())))
+        self._router = None
+        self._reachability = reachability
+        self._scheduler = None
+        self._autoclose = None  # door name -> seconds it stays open, see `_set_autoclose`
+        self._autoclose_timers = {}  # door name -> `scheduler.Timer` closing it
+        self._crew = None
+        self._crew_timer = None
+        self._listeners = []
+        self.on_quit = lambda: vispy.app.quit()  # Called by the quit command, see `worker.AgentWorker`.
+        self.on_update_interval = lambda: None  # Called when `update_interval` changed, see `Application`.
+        self._chatbot = chatbot if chatbot is not None else HAL9000.create_chatbot()
         self._commands = {
-            'quit': lambda x: vispy.app.quit(),
+            'quit': lambda x: self.on_quit(),
             'open': self._try_to_open_door,
             'close': self._try_to_close_door,
             'goto': self._try_to_relocate,
             'relocate': self._try_to_relocate,
             'where': self._print_where,
-            'transitions': self._print_possible_transitions
+            'reachable': self._print_reachable,
+            'transitions': self._print_possible_transitions,
+            'stats': self._print_stats,
+            'after': self._schedule_command,
+            'announce': self._schedule_announcement,
+            'autoclose': self._set_autoclose,
+            'crew': self._manage_crew,
+            'who': self._print_who
         }
+        self._command_names = Trie(self._commands)
 
-    def _create_map(self):
-        self._map.add_rooms(('start location', 'main corridor', 'kitchen', 'store', 'command post', 'bathroom',
-                             'engineering module', 'ventilating trunk'))
+        self._stats = stats
+        if stats is not None:
+            self.on_input = self._on_input_timed
+            for name, handler in self._commands.items():
+                self._commands[name] = stats.timed('/' + name, handler)
 
-        self._map.add_door('gate 1', 'start location', 'main corridor')
-        self._map.add_door('engineering hatch', 'start location', 'engineering module')
-        self._map.add_door('vent flap 1', 'start location', 'ventilating trunk')
+    @staticmethod
+    def create_chatbot(classifier=False):
+        """Compiles the responses table into a `matcher.IntentMatcher`, or a `classifier.IntentClassifier`
+        that also understands misspelled requests.
+        """
+        import nltk.chat.util  # Chat-bot, only its reflections are used and importing `nltk` takes a while.
+        if classifier:
+            from classifier import IntentClassifier
+            return IntentClassifier(HAL9000._responses, nltk.chat.util.reflections)
+        return IntentMatcher(HAL9000._responses, nltk.chat.util.reflections)
 
-        self._map.add_door('gate 2', 'main corridor', 'command post')
-        self._map.add_door('gate 3', 'main corridor', 'engineering module')
-        self._map.add_door('gate 4', 'main corridor', 'kitchen')
-        self._map.add_door('gate 5', 'main corridor', 'bathroom')
+    @staticmethod
+    def _create_map(ship):
+        ship.add_rooms(('start location', 'main corridor', 'kitchen', 'store', 'command post', 'bathroom',
+                        'engineering module', 'ventilating trunk'))
 
-        self._map.add_door('vent flap 2', 'ventilating trunk', 'command post')
-        self._map.add_door('vent flap 3', 'ventilating trunk', 'engineering module')
-        self._map.add_door('vent flap 4', 'ventilating trunk', 'kitchen')
-        self._map.add_door('vent flap 5', 'ventilating trunk', 'bathroom')
-        self._map.add_door('vent flap 6', 'ventilating trunk', 'store')
+        ship.add_door('gate 1', 'start location', 'main corridor')
+        ship.add_door('engineering hatch', 'start location', 'engineering module')
+        ship.add_door('vent flap 1', 'start location', 'ventilating trunk')
 
-        self._map.add_door('small door', 'kitchen', 'store')
+        ship.add_door('gate 2', 'main corridor', 'command post')
+        ship.add_door('gate 3', 'main corridor', 'engineering module')
+        ship.add_door('gate 4', 'main corridor', 'kitchen')
+        ship.add_door('gate 5', 'main corridor', 'bathroom')
+
+        ship.add_door('vent flap 2', 'ventilating trunk', 'command post')
+        ship.add_door('vent flap 3', 'ventilating trunk', 'engineering module')
+        ship.add_door('vent flap 4', 'ventilating trunk', 'kitchen')
+        ship.add_door('vent flap 5', 'ventilating trunk', 'bathroom')
+        ship.add_door('vent flap 6', 'ventilating trunk', 'store')
+
+        ship.add_door('small door', 'kitchen', 'store')
+        return ship
 
     def on_input(self, evt):
         """Called when user types anything in the terminal, connected via event.
@@ -98,13 +169,67 @@ class HAL9000(object):
             self._execute_command(output)
             return
 
+        self._terminal.log(self._substitute(output), align='right', color='#00805A')
+
+    def _on_input_timed(self, evt):
+        """Same as `on_input`, but records how long matching, substitution and logging take.
+        """
+        started = time.perf_counter()
+        player_input = evt.text.lower().replace('i\'m', 'i am')
+        output = self._chatbot.respond(player_input)
+        matched = time.perf_counter()
+        self._stats.add('input: match', matched - started)
+
+        if '${execute}' in output:
+            output = output[11:]
+            self._execute_command(output)
+            self._stats.add('input', time.perf_counter() - started)
+            return
+
+        output = self._substitute(output)
+        substituted = time.perf_counter()
+        self._stats.add('input: substitution', substituted - matched)
+
+        self._terminal.log(output, align='right', color='#00805A')
+        logged = time.perf_counter()
+        self._stats.add('input: logging', logged - substituted)
+        self._stats.add('input', logged - started)
+
+    def _substitute(self, output):
         if '${daytime}' in output:
             output = output.replace('${daytime}', self._get_current_day_time_string())
 
         if '${location}' in output:
             output = output.replace('${location}', self._location.name())
 
-        self._terminal.log(output, align='right', color='#00805A')
+        return output
+
+    def complete(self, text):
+        """Completes a command name, or the room or door name at the end of the `text` typed so far. Returns the
+        completed text and, if there are several candidates, the first `COMPLETIONS` of them.
+        """
+        if text.startswith('/') and ' ' not in text:
+            common = self._command_names.common_prefix(text[1:])
+            if common is None:
+                return text, []
+            names = self._command_names.complete(text[1:], COMPLETIONS + 1)
+            return '/' + common + (' ' if names == [common] else ''), self._candidates(names)
+
+        # Names may have several words, so the longest ending of the text that starts a name is completed.
+        lowered = text.lower()
+        for start in range(len(text)):
+            if (start and text[start - 1] != ' ') or text[start] == ' ':
+                continue
+            common, names = self._map.complete(lowered[start:], COMPLETIONS + 1)
+            if common is not None:
+                return text[:start] + common, self._candidates(names)
+        return text, []
+
+    @staticmethod
+    def _candidates(names):
+        if len(names) < 2:
+            return []
+        return names[:COMPLETIONS] + ['...'] if len(names) > COMPLETIONS else names
 
     def on_command(self, evt):
         """Called when user types a command starting with `/` also done via events.
@@ -119,13 +244,183 @@ class HAL9000(object):
             execute_command(attribute)
 
         else:
-            self._terminal.log('Command \'{}\' unknown.'.format(command), align='left', color='#ff3000')
-            self._terminal.log("I'm afraid I can't do that.", align='right', color='#00805A')
+            self._terminal.log_lines([('Command \'{}\' unknown.'.format(command), 'left', '#ff3000'),
+                                      ("I'm afraid I can't do that.", 'right', '#00805A')])
 
     def update(self, _):
-        """Main update called once per second via the timer.
+        """Main update called every `update_interval` seconds via the timer, fires the scheduled actions,
+        builds the route trees and goes on with the searches after closed doors, a few rooms at a time. Once none
+        of these are left, `update_interval` is reset to `None` until the next one comes up.
+        """
+        if self._scheduler is not None:
+            self._scheduler.advance()
+        if self._router is not None:
+            self._router.grow()
+        if self._reachability is not None:
+            self._reachability.settle()
+        if self.update_interval is not None and not self._updating():
+            self.update_interval = None
+            self.on_update_interval()
+
+    def _updating(self):
+        return ((self._scheduler is not None and len(self._scheduler) > 0) or
+                (self._router is not None and self._router.growing()) or
+                (self._reachability is not None and self._reachability.settling()))
+
+    def _request_updates(self):
+        if self.update_interval is None:
+            self.update_interval = UPDATE_INTERVAL
+            self.on_update_interval()
+
+    def schedule(self, delay, action, *args):
+        """Calls `action(*args)` from `update` once `delay` seconds have passed. Returns a `scheduler.Timer`
+        that can be cancelled.
         """
-        pass
+        if self._scheduler is None:
+            self._scheduler = Scheduler(UPDATE_INTERVAL)  # Created on demand, advanced by `update`.
+        elif self.update_interval is None:
+            self._scheduler.advance()  # Catches up with the time that passed without updates.
+        timer = self._scheduler.schedule(delay, action, *args)
+        self._request_updates()
+        return timer
+
+    def _parse_delay(self, attribute, what):
+        """Splits `attribute` into a delay in seconds and the rest, logs an error unless both are given.
+        """
+        delay, _, rest = attribute.partition(' ')
+        try:
+            delay = float(delay)
+        except ValueError:
+            delay = -1.0
+        if not (delay >= 0.0 and math.isfinite(delay)) or not rest.strip():
+            self._terminal.log_lines([('Expected a delay in seconds and {}.'.format(what), 'left', '#ff3000'),
+                                      ("I'm afraid I can't do that.", 'right', '#00805A')])
+            return None, None
+        return delay, rest.strip()
+
+    def _schedule_command(self, attribute):
+        if not attribute:
+            count = len(self._scheduler) if self._scheduler is not None else 0
+            self._terminal.log('{} actions are scheduled.'.format(count), align='right', color='#00805A')
+            return
+
+        delay, command = self._parse_delay(attribute, 'a command')
+        if command is None:
+            return
+        if command.split()[0] not in self._commands:
+            self._terminal.log_lines([('Command \'{}\' unknown.'.format(command), 'left', '#ff3000'),
+                                      ("I'm afraid I can't do that.", 'right', '#00805A')])
+            return
+        self.schedule(delay, self._execute_command, command)
+        self._terminal.log('I will run \'{}\' in {:g} seconds.'.format(command, delay), align='right',
+                           color='#00805A')
+
+    def _schedule_announcement(self, attribute):
+        delay, text = self._parse_delay(attribute, 'a text')
+        if text is None:
+            return
+        self.schedule(delay, self._terminal.log, '\u2014 {} \u2014'.format(text[:1].upper() + text[1:]), 'center',
+                      '#404040')
+        self._terminal.log('I will announce it in {:g} seconds.'.format(delay), align='right', color='#00805A')
+
+    def _set_autoclose(self, attribute):
+        delay, door_name = self._parse_delay(attribute, 'a door')
+        if door_name is None:
+            return
+        door = self._map.get_door(self._resolve_door(door_name, self._location.get_doors()))
+        if door is None:
+            self._terminal.log('I\'m afraid there is no {} on the ship.'.format(door_name), align='right',
+                               color='#00805A')
+            return
+
+        if self._autoclose is None:
+            self._autoclose = {}
+            self._map.add_listener(self._on_door_state_changed)  # Added on demand, see `_on_door_state_changed`.
+        if delay:
+            self._autoclose[door.name()] = delay
+            self._terminal.log('The {} will close {:g} seconds after it is opened.'.format(door.name(), delay),
+                               align='right', color='#00805A')
+        else:
+            self._autoclose.pop(door.name(), None)
+            self._terminal.log('The {} will stay open.'.format(door.name()), align='right', color='#00805A')
+        self._on_door_state_changed(door)
+
+    def _on_door_state_changed(self, door):
+        """Schedules doors with an auto-close delay to close once opened, and forgets them once closed.
+        """
+        timer = self._autoclose_timers.pop(door.name(), None)
+        if timer is not None:
+            timer.cancel()
+        if door.state() == DoorState.OPEN and door.name() in self._autoclose:
+            self._autoclose_timers[door.name()] = self.schedule(self._autoclose[door.name()], self._auto_close,
+                                                                door.name())
+
+    def _auto_close(self, door_name):
+        del self._autoclose_timers[door_name]
+        door = self._map.get_door(door_name)
+        if door.state() == DoorState.OPEN:
+            self._terminal.log('The {} closed automatically.'.format(door_name), align='right', color='#00805A')
+            door.set_state(DoorState.CLOSED)
+
+    def add_crew(self, size, seed=0):
+        """Replaces the crew walking around the ship by `size` new members, see `crew.Crew`, or removes it if
+        `size` is 0. The crew takes a step every `CREW_STEP_INTERVAL` seconds.
+        """
+        if self._crew is not None:
+            self._crew.close()
+            self._crew_timer.cancel()
+            self._crew = self._crew_timer = None
+        if size:
+            self._crew = Crew(self._map, size, seed=seed)
+            self._crew_timer = self.schedule(CREW_STEP_INTERVAL, self._step_crew)
+
+    def _step_crew(self):
+        started = time.perf_counter()
+        self._crew.step()
+        if self._stats is not None:
+            self._stats.add('crew: step', time.perf_counter() - started)
+        self._crew_timer = self.schedule(CREW_STEP_INTERVAL, self._step_crew)
+
+    def _manage_crew(self, attribute):
+        if not attribute:
+            if self._crew is None:
+                self._terminal.log('There is no crew on board.', align='right', color='#00805A')
+                return
+            rooms = ', '.join('{} in the {}'.format(count, name) for name, count in self._crew.busiest(CREW_LISTED))
+            self._terminal.log('{} crew members are on board, the most crowded rooms have {}.'.format(
+                len(self._crew), rooms), align='right', color='#00805A')
+            return
+
+        try:
+            size = int(attribute)
+        except ValueError:
+            size = -1
+        if size < 0:
+            self._terminal.log_lines([('Expected the number of crew members.', 'left', '#ff3000'),
+                                      ("I'm afraid I can't do that.", 'right', '#00805A')])
+            return
+        self.add_crew(size)
+        if size:
+            self._terminal.log('{} crew members came on board.'.format(size), align='right', color='#00805A')
+        else:
+            self._terminal.log('The crew left the ship.', align='right', color='#00805A')
+
+    def _print_who(self, room_name):
+        room = self._location if not room_name else self._map.find_room(room_name)
+        if room is None:
+            self._terminal.log('There is no {} on the ship.'.format(room_name), align='right', color='#00805A')
+            return
+        members = self._crew.members(room.name()) if self._crew is not None else []
+        if not members:
+            self._terminal.log('No crew member is in the {}.'.format(room.name()), align='right', color='#00805A')
+            return
+        names = ', '.join('crew member {}'.format(member) for member in members[:CREW_LISTED])
+        more = ' and {} more'.format(len(members) - CREW_LISTED) if len(members) > CREW_LISTED else ''
+        if len(members) == 1:
+            line = 'Only {} is in the {}.'.format(names, room.name())
+        else:
+            line = '{} crew members are in the {}: {}{}.'.format(len(members), room.name(), names, more)
+        self._terminal.log(line, align='right', color='#00805A')
 
     def _print_where(self, where):
         if not where:
@@ -133,6 +428,8 @@ class HAL9000(object):
             self._terminal.log(output, align='right', color='#00805A')
             return
 
+        where = self._resolve_name(where)
+
         if where in self._location.get_doors():
             door = self._map.get_door(where)
             to = []
@@ -150,45 +447,105 @@ class HAL9000(object):
             return
 
         if where == self._location.name():
-            self._print_possible_transitions()
+            self._print_possible_transitions(None)
+            return
+
+        if self._map.get_room(where) is not None:
+            route = self._route(where)
+            if route:
+                self._terminal.log('You can get to the {} this way: {}.'.format(where, self._describe_route(route)),
+                                   align='right', color='#00805A')
+            else:
+                self._terminal.log('I\'m afraid there is no open way from the {} to the {}.'
+                                   .format(self._location.name(), where), align='right', color='#00805A')
             return
 
         self._terminal.log('Hm... There is no {} near the {}.'.format(where, self._location.name()),
                            align='right', color='#00805A')
 
+    def _print_stats(self, _):
+        if self._stats is None:
+            self._terminal.log('Latency statistics are disabled, start me with --stats.', align='right',
+                               color='#00805A')
+            return
+
+        lines = ['{:<22}{:>8}{:>10}{:>10}{:>10}'.format('Latency, ms', 'calls', 'p50', 'p95', 'p99')]
+        for name, summary in sorted(self._stats.summary().items()):
+            lines.append('{:<22}{:>8}{:>10.3f}{:>10.3f}{:>10.3f}'.format(
+                name, summary['count'], summary['p50'] * 1e3, summary['p95'] * 1e3, summary['p99'] * 1e3))
+        cache = self._chatbot.cache_info()
+        lines.append('Intent cache: {} hits, {} misses, {} of {} entries.'.format(cache.hits, cache.misses,
+                                                                                 cache.currsize, cache.maxsize))
+        self._terminal.log_lines([(line, 'left', '#404040') for line in lines])
+
     def _print_possible_transitions(self, _):
-        self._terminal.log('From {} you can go:'.format(self._location.name()), align='right', color='#00805A')
+        lines = ['From {} you can go:'.format(self._location.name())]
         for room_name, doors in self._location.possible_transitions().items():
-            self._terminal.log('- to the {} through {}.'.format(room_name, ', '.join(doors)), align='right',
-                               color='#00805A')
+            lines.append('- to the {} through {}.'.format(room_name, ', '.join(doors)))
+
+        region = self._reachable().reachable(self._location.name())
+        if len(region) > 1:
+            names = heapq.nsmallest(REACHABLE_LISTED + 1, (name for name in region if name != self._location.name()))
+            more = ' and {} more'.format(len(region) - 1 - REACHABLE_LISTED) if len(names) > REACHABLE_LISTED else ''
+            lines.append('Through open doors you can reach the {}{}.'.format(
+                ', '.join(names[:REACHABLE_LISTED]), more))
+        else:
+            lines.append('All doors around are closed.')
+        self._terminal.log_lines([(line, 'right', '#00805A') for line in lines])
+
+    def _print_reachable(self, room_name):
+        if not room_name:
+            self._terminal.log_lines([('Expected the name of a room.', 'left', '#ff3000'),
+                                      ("I'm afraid I can't do that.", 'right', '#00805A')])
+            return
+
+        room = self._map.find_room(room_name)
+        if room is None:
+            self._terminal.log('There is no {} on the ship.'.format(room_name), align='right', color='#00805A')
+        elif self._reachable().is_reachable(self._location.name(), room.name()):
+            self._terminal.log('Yes, the {} can be reached through open doors.'.format(room.name()),
+                               align='right', color='#00805A')
+        else:
+            self._terminal.log('No, there is no open way from the {} to the {}.'.format(self._location.name(),
+                                                                                         room.name()),
+                               align='right', color='#00805A')
+
+    def _reachable(self):
+        if self._reachability is None:
+            self._reachability = Reachability(self._map)  # Created on demand, it follows door changes itself.
+        return self._reachability
 
     def _try_to_relocate(self, location_name):
         if not location_name:
-            self._terminal.log('Where do you want to go?', align='right', color='#00805A')
-            for room_name in self._location.possible_transitions():
-                self._terminal.log('- {}.'.format(room_name), align='right', color='#00805A')
+            lines = ['Where do you want to go?']
+            lines.extend('- {}.'.format(room_name) for room_name in self._location.possible_transitions())
+            self._terminal.log_lines([(line, 'right', '#00805A') for line in lines])
             return
 
-        new_location = self._map.get_room(location_name)
+        new_location = self._map.find_room(location_name)
+        if new_location is not None:
+            location_name = new_location.name()
         if new_location is None:
-            self._terminal.log('Location \'{}\' unknown.'.format(location_name), align='left', color='#ff3000')
-            self._terminal.log('There is no {} on the ship.'.format(location_name), align='right', color='#00805A')
+            self._terminal.log_lines([('Location \'{}\' unknown.'.format(location_name), 'left', '#ff3000'),
+                                      ('There is no {} on the ship.'.format(location_name), 'right', '#00805A')])
 
         elif location_name != self._location.name():
             doors = self._location.get_doors(location_name)
-            if doors:
-                for door_name in doors:
-                    door = self._map.get_door(door_name)
-                    if door.state() == DoorState.OPEN:
-                        self._location = new_location
-                        self._terminal.log('', align='center', color='#404040')
-                        self._terminal.log('\u2014 Now in the {}. \u2014'.format(location_name), align='center',
-                                           color='#404040')
-                        return
-                self._terminal.log('I\'m afraid all doors to the {} are closed.'.format(location_name), align='right',
-                                   color='#00805A')
-                self._terminal.log('You have to open one of these doors: {}'.format(', '.join(doors)), align='right',
-                                   color='#00805A')
+            for door_name in doors:
+                door = self._map.get_door(door_name)
+                if door.state() == DoorState.OPEN:
+                    self._relocate(new_location)
+                    return
+
+            route = self._route(location_name)
+            if route:
+                self._terminal.log('Going {}.'.format(self._describe_route(route)), align='right', color='#00805A')
+                self._relocate(new_location)
+
+            elif doors:
+                self._terminal.log_lines([
+                    ('I\'m afraid all doors to the {} are closed.'.format(location_name), 'right', '#00805A'),
+                    ('You have to open one of these doors: {}'.format(', '.join(doors)), 'right', '#00805A')])
 
             else:
                 self._terminal.log('I\'m afraid you can\'t relocate to the {} from your current location.'
@@ -197,6 +554,58 @@ class HAL9000(object):
         else:
             self._terminal.log('You are already in the {}!'.format(location_name), align='right', color='#00805A')
 
+    def _resolve_door(self, door_name, doors):
+        """Corrects typos in a `door_name`, preferring the `doors` of the current location over all doors.
+        Names of doors anywhere on the ship are kept as they are.
+        """
+        if door_name in doors or self._map.get_door(door_name) is not None:
+            return door_name
+        match = closest(door_name, doors)
+        if match is None:
+            door = self._map.find_door(door_name)
+            match = door_name if door is None else door.name()
+        return match
+
+    def _resolve_name(self, name):
+        """Corrects typos in the `name` of a door or a room, preferring names around the current location.
+        Names of doors or rooms anywhere on the ship are kept as they are.
+        """
+        if self._map.get_door(name) is not None or self._map.get_room(name) is not None:
+            return name
+        transitions = self._location.possible_transitions()
+        match = closest(name, list(self._location.get_doors()) + list(transitions) + [self._location.name()])
+        if match is None:
+            room = self._map.find_room(name)
+            match = name if room is None else room.name()
+        return match
+
+    def _route(self, to_room):
+        if self._router is None:
+            self._router = RoutePlanner(self._map)  # Created on demand, it keeps its own caches.
+        route = self._router.route(self._location.name(), to_room)
+        if self._router.growing():
+            self._request_updates()  # Trees are built and repaired by `update`, off the input path.
+        return route
+
+    def _relocate(self, new_location):
+        self._location = new_location
+        self._terminal.log_lines([('', 'center', '#404040'),
+                                  ('\u2014 Now in the {}. \u2014'.format(new_location.name()), 'center', '#404040')])
+        for listener in self._listeners:
+            listener(new_location)
+
+    def add_listener(self, listener):
+        """Registers `listener(room)` to be called every time the operator is relocated.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    @staticmethod
+    def _describe_route(route):
+        return ', then '.join('through {} to the {}'.format(door_name, room_name) for door_name, room_name in route)
+
     def _try_to_open_door(self, door_name):
         self._try_to_operate_door(door_name, DoorState.OPEN)
 
@@ -206,11 +615,12 @@ class HAL9000(object):
     def _try_to_operate_door(self, door_name, new_state):
         doors = self._location.get_doors()
         if not door_name:
-            self._terminal.log('Which door do you want to open?', align='right', color='#00805A')
-            for door_name in doors:
-                self._terminal.log('- {}.'.format(door_name), align='right', color='#00805A')
+            lines = ['Which door do you want to open?']
+            lines.extend('- {}.'.format(door_name) for door_name in doors)
+            self._terminal.log_lines([(line, 'right', '#00805A') for line in lines])
             return
 
+        door_name = self._resolve_door(door_name, doors)
         if door_name not in doors:
             self._terminal.log('I\'m afraid there is no {} in the {}.'.format(door_name, self._location.name()),
                                align='right', color='#00805A')
@@ -224,6 +634,8 @@ class HAL9000(object):
 
         self._terminal.log('The {} is now {}.'.format(door_name, state_name), align='right', color='#00805A')
         door.set_state(new_state)
+        if self._updating():
+            self._request_updates()  # Trees to repair and regions to search, see `update`.
 
     @staticmethod
     def _get_current_day_time_string():
@@ -237,34 +649,239 @@ class HAL9000(object):
         return 'evening'
 
 
+def create_ship(layout=None, map_class=Map):
+    """Loads the ship from a `layout` file, or creates the default one, see `HAL9000._create_map`.
+    """
+    if layout:
+        return load_layout(layout, map_class)
+    return HAL9000._create_map(map_class())
+
+
 class Application(object):
-    
-    def __init__(self):
+    """Shows the terminal first and warms the agent up in the background: the chat-bot is compiled and the ship
+    is loaded (from `layout` into a `map_class` unless a `ship` is given) on a worker thread, where the state
+    saved in the `journal` is restored as well. Inputs typed meanwhile are queued and answered once the agent joins.
+    The agent starts with `crew` members walking around the ship, see `HAL9000.add_crew`.
+
+    If `threaded`, the agent keeps running on a `worker.AgentWorker` thread so that the terminal never waits for
+    it. Inputs are answered one at a time in the order they were typed, and Ctrl+C drops the inputs that are
+    still waiting, both before and after the agent joined.
+    """
+
+    WARMUP_POLL_INTERVAL = 0.05
+    RESULT_POLL_INTERVAL = 1.0 / 60.0
+
+    def __init__(self, ship=None, stats=None, layout=None, map_class=Map, profile_startup=False, journal=None,
+                 classifier=False, threaded=False, crew=0):
+        import window               # Terminal input and display, imported here so the agent can run headless.
+
         # Create and open the window for user interaction.
         self.window = window.TerminalWindow()
 
         # Print some default lines in the terminal as hints.
         self.window.log('Operator started the chat.', align='left', color='#808080')
-        self.window.log('HAL9000 joined.', align='right', color='#808080')
 
-        # Construct and initialize the agent for this simulation.
-        self.agent = HAL9000(self.window)
+        # The agent is constructed once the warm-up finished, see `on_warmup_poll`.
+        self.agent = None
+        self._stats = stats
+        self._layout = layout
+        self._journal = journal
+        self._pending = []
+        self._threaded = threaded
+        self._crew = crew
+        self._worker = None
+        self._result_timer = None
+        self._update_timer = None
+        self._warmup_result = None
+        self._warmup = threading.Thread(target=self._warm_up, args=(ship, layout, map_class, classifier))
+        self._warmup.daemon = True
+        self._warmup_timer = vispy.app.Timer(interval=Application.WARMUP_POLL_INTERVAL, connect=self.on_warmup_poll)
 
         # Connect the terminal's existing events.
-        self.window.events.user_input.connect(self.agent.on_input)
-        self.window.events.user_command.connect(self.agent.on_command)
+        self.window.events.user_input.connect(self.on_input)
+        self.window.events.user_command.connect(self.on_command)
+        self.window.events.user_cancel.connect(self.on_cancel)
+
+        self._profile = {} if profile_startup else None
+        if profile_startup:
+            self.window.canvas.events.draw.connect(self.on_first_draw)
+            self.on_input(window.TextEvent('hello'))  # As if the operator typed it right away.
+
+    def _warm_up(self, ship, layout, map_class, classifier):
+        try:
+            chatbot = HAL9000.create_chatbot(classifier)
+            if ship is None:
+                ship = create_ship(layout, map_class)
+            ship.index_names()  # Builds the trie and the fuzzy indices of names off the UI thread.
+            location = self._journal.restore(ship) if self._journal is not None else None
+            reachability = Reachability(ship)  # Labels the regions of the ship off the UI thread.
+            self._warmup_result = ship, chatbot, location, reachability
+        except Exception as error:  # E.g. a missing layout file or a corrupt journal, reported by `on_warmup_poll`.
+            if not isinstance(error, LayoutError):
+                traceback.print_exc()
+            self._warmup_result = error
+
+    def on_warmup_poll(self, _):
+        if self._warmup.is_alive():
+            return
+        self._warmup_timer.stop()
+
+        if isinstance(self._warmup_result, Exception):
+            if isinstance(self._warmup_result, LayoutError):
+                message = '{}:{}'.format(self._layout, self._warmup_result)
+            else:
+                message = 'HAL9000 could not start: {}'.format(self._warmup_result)
+            self._pending = []
+            self.window.log(message, align='left', color='#ff3000')
+            return
+
+        ship, chatbot, location, reachability = self._warmup_result
+        if self._threaded:
+            terminal = BufferedTerminal()
+            self.agent = HAL9000(terminal, ship, chatbot, self._stats, location, reachability)
+            self.agent.add_crew(self._crew)
+            self._worker = AgentWorker(self.agent, terminal, vispy.app.quit, self._stats, self.on_update_interval)
+            self._worker.start()
+            self._result_timer = vispy.app.Timer(interval=Application.RESULT_POLL_INTERVAL,
+                                                 connect=self.on_result_poll)
+        else:
+            self.agent = HAL9000(self.window, ship, chatbot, self._stats, location, reachability)
+            self.agent.add_crew(self._crew)
+        self.window.completer = self.agent.complete
+        if self._journal is not None:
+            ship.add_listener(self._journal.on_door_state_changed)
+            self.agent.add_listener(self._journal.on_relocated)
+        self.window.log('HAL9000 joined.', align='right', color='#808080')
+        if self._profile is not None:
+            self._profile['agent ready'] = time.perf_counter() - STARTED
+
+        if self._worker is None:
+            self.agent.on_update_interval = self.on_update_interval
+        self.on_update_interval()
+
+        pending, self._pending = self._pending, []
+        for handler, evt in pending:
+            handler(evt)
+
+    def on_input(self, evt):
+        if self.agent is None:
+            self._pending.append((self.on_input, evt))
+            return
+        if self._worker is not None:
+            self._submit(self.agent.on_input, evt)
+            return
+        self.agent.on_input(evt)
+        self._on_first_response()
+
+    def on_command(self, evt):
+        if self.agent is None:
+            self._pending.append((self.on_command, evt))
+            return
+        if self._worker is not None:
+            self._submit(self.agent.on_command, evt)
+            return
+        self.agent.on_command(evt)
+
+    def on_cancel(self, _):
+        cancelled = len(self._pending)
+        self._pending = []
+        if self._worker is not None:
+            cancelled += self._worker.cancel()
+        if cancelled:
+            self.window.log('Cancelled {} waiting inputs.'.format(cancelled), align='left', color='#808080')
+
+    def on_update_interval(self):
+        """Starts the update timer while the agent has an `update_interval`, and stops it otherwise.
+        """
+        interval = self.agent.update_interval
+        if interval is None:
+            if self._update_timer is not None:
+                self._update_timer.stop()
+            return
+        if self._update_timer is None:
+            self._update_timer = vispy.app.Timer(interval=interval)
+            self._update_timer.connect(self.agent.update if self._worker is None else self.on_update)
+        self._update_timer.interval = interval
+        if not self._update_timer.running:
+            self._update_timer.start()
+
+    def on_update(self, evt):
+        self._worker.submit_update(evt)
+        if not self._result_timer.running:
+            self._result_timer.start()
+
+    def _submit(self, handler, evt):
+        self._worker.submit(handler, evt)
+        if not self._result_timer.running:
+            self._result_timer.start()
+
+    def on_result_poll(self, _):
+        if self._worker.poll(self.window.log_lines):
+            self._on_first_response()
+        if not self._worker.busy():
+            self._result_timer.stop()
+
+    def _on_first_response(self):
+        if self._profile is not None and 'first response' not in self._profile:
+            self._profile['first response'] = time.perf_counter() - STARTED
+            self._report_startup()
+
+    def on_first_draw(self, _):
+        self.window.canvas.events.draw.disconnect(self.on_first_draw)
+        self._profile['first frame'] = time.perf_counter() - STARTED
+        self._report_startup()
+
+    def _report_startup(self):
+        if len(self._profile) == 3:
+            for phase in ('first frame', 'agent ready', 'first response'):
+                sys.stderr.write('{:<16}{:8.3f}s\n'.format(phase, self._profile[phase]))
+            vispy.app.quit()
 
     def run(self):
-        timer = vispy.app.Timer(interval=1.0)
-        timer.connect(self.agent.update)
-        timer.start()
-        
+        self._warmup.start()
+        self._warmup_timer.start()
         vispy.app.run()
+        if self._worker is not None:
+            self._worker.stop()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='HAL9000 terminal.')
+    parser.add_argument('--compact-map', action='store_true', help='use the array-backed map for large ships')
+    parser.add_argument('--layout', help='load the ship from a text or compiled layout file')
+    parser.add_argument('--stats', action='store_true', help='measure latencies of inputs and commands, see /stats')
+    parser.add_argument('--stats-json', metavar='PATH', help='measure latencies and write them here on exit')
+    parser.add_argument('--classifier', action='store_true', help='use the n-gram intent classifier')
+    parser.add_argument('--threaded', action='store_true',
+                        help='answer inputs on a worker thread, Ctrl+C drops the inputs still waiting')
+    parser.add_argument('--crew', type=int, default=0, metavar='SIZE',
+                        help='simulate this many crew members walking around the ship, see /crew and /who')
+    parser.add_argument('--journal', metavar='DIR', help='save door states and the location here and resume them')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print the time to the first frame and to the first response, then quit')
+    parser.add_argument('--render-metrics', metavar='PATH',
+                        help='record draw times and render costs of every frame and write them here on exit, as CSV '
+                             'if PATH ends with .csv and as JSON otherwise, F3 shows them in the window')
+    args = parser.parse_args()
+
     vispy.set_log_level('WARNING')
     vispy.use(app='glfw')
     
-    app = Application()
+    stats = LatencyRecorder() if args.stats or args.stats_json else None
+    journal = Journal(args.journal) if args.journal else None
+    app = Application(stats=stats, layout=args.layout, map_class=CompactMap if args.compact_map else Map,
+                      profile_startup=args.profile_startup, journal=journal, classifier=args.classifier,
+                      threaded=args.threaded, crew=args.crew)
+    if args.render_metrics:
+        app.window.enable_metrics()
     app.run()
+
+    if journal is not None:
+        journal.close()
+
+    if args.stats_json:
+        with open(args.stats_json, 'w', encoding='utf-8') as stream:
+            stats.dump(stream)
+
+    if args.render_metrics:
+        app.window.metrics.write(args.render_metrics)
@@ -6,6 +6,11 @@
 __author__ = 'Victor Zarubkin'
 __email__ = 'v.s.zarubkin@gmail.com'
 
+import itertools
+
+from fuzzy import FuzzyIndex
+from trie import Trie
+
 
 class DoorState(object):
 
@@ -22,14 +27,35 @@ class DoorState(object):
 
         return 'open'
 
+    @staticmethod
+    def from_str(name):
+        return {'closed': DoorState.CLOSED, 'open': DoorState.OPEN}.get(name)
+
+
+class LayoutError(ValueError):
+    """Raised for layout lines that can not be applied to the map, e.g. doors leading to unknown rooms, and for
+    compiled layouts that are damaged, which have no `line_number`.
+    """
+
+    def __init__(self, line_number, message):
+        location = '' if line_number is None else 'line {}: '.format(line_number)
+        super(LayoutError, self).__init__(location + message)
+        self.line_number = line_number
+        self.message = message
+
+    def __reduce__(self):
+        # Rebuilt from both arguments, e.g. when a process pool passes the error back to its parent.
+        return LayoutError, (self.line_number, self.message)
+
 
 class Door(object):
 
-    def __init__(self, rooms, name=''):
+    def __init__(self, rooms, name='', on_state_changed=None):
         object.__init__(self)
         self._name = name
         self._state = DoorState.CLOSED
         self._rooms = rooms
+        self._on_state_changed = on_state_changed
 
     def name(self):
         return self._name
@@ -38,8 +64,10 @@ class Door(object):
         return self._state
 
     def set_state(self, state):
-        if state in (DoorState.CLOSED, DoorState.OPEN):
+        if state in (DoorState.CLOSED, DoorState.OPEN) and state != self._state:
             self._state = state
+            if self._on_state_changed is not None:
+                self._on_state_changed(self)
 
     def between(self):
         return self._rooms
@@ -80,16 +108,102 @@ class Room(object):
         return self._transitions.get(to_room, [])
 
 
-class Map(object):
+class MapNames(object):
+    """Checks, lookups and completions of room and door names shared by `Map` and `compact_map.CompactMap`.
+
+    Subclasses provide `get_room`, `get_door` and the iterables `_room_names()` and `_door_names()`, and call
+    `_name_added(name, is_room)` for every room and door they add. The fuzzy indices and the trie of names are
+    built on first use, or all at once by `index_names`.
+    """
 
     def __init__(self):
         object.__init__(self)
+        self._room_index = None  # Fuzzy indices of names, built on the first lookup of a misspelled name.
+        self._door_index = None
+        self._names = None  # Trie of room and door names, built on the first completion.
+
+    def check_room(self, name):
+        """Returns the reason why a room with this `name` can not be added, or `None` if it can.
+        """
+        if not name:
+            return 'room must have a name'
+        if self.get_room(name) is not None:
+            return 'room \'{}\' already exists'.format(name)
+        return None
+
+    def check_door(self, door_name, room1, room2):
+        """Returns the reason why a door with this `door_name` can not be added between `room1` and `room2`,
+        or `None` if it can.
+        """
+        if not door_name:
+            return 'door must have a name'
+        if self.get_door(door_name) is not None:
+            return 'door \'{}\' already exists'.format(door_name)
+        for room in (room1, room2):
+            if self.get_room(room) is None:
+                return 'door \'{}\' leads to unknown room \'{}\''.format(door_name, room)
+        return None
+
+    def index_names(self):
+        """Builds the fuzzy indices and the trie of names right away, e.g. while the application warms up.
+        """
+        if self._room_index is None:
+            self._room_index = FuzzyIndex(self._room_names())
+        if self._door_index is None:
+            self._door_index = FuzzyIndex(self._door_names())
+        if self._names is None:
+            self._names = Trie(itertools.chain(self._room_names(), self._door_names()))
+
+    def _name_added(self, name, is_room):
+        index = self._room_index if is_room else self._door_index
+        if index is not None:
+            index.add(name)
+        if self._names is not None:
+            self._names.add(name)
+
+    def find_room(self, name):
+        """Returns the room called `name` or, if there is none, the room whose name is closest to it.
+        """
+        room = self.get_room(name)
+        if room is None and name:
+            if self._room_index is None:
+                self._room_index = FuzzyIndex(self._room_names())
+            match = self._room_index.find(name)
+            room = None if match is None else self.get_room(match)
+        return room
+
+    def find_door(self, name):
+        """Returns the door called `name` or, if there is none, the door whose name is closest to it.
+        """
+        door = self.get_door(name)
+        if door is None and name:
+            if self._door_index is None:
+                self._door_index = FuzzyIndex(self._door_names())
+            match = self._door_index.find(name)
+            door = None if match is None else self.get_door(match)
+        return door
+
+    def complete(self, prefix, limit=None):
+        """Returns the longest common prefix of all room and door names starting with `prefix` (or `None` if there
+        is none) and the first `limit` of these names in sorted order.
+        """
+        if self._names is None:
+            self._names = Trie(itertools.chain(self._room_names(), self._door_names()))
+        return self._names.common_prefix(prefix), self._names.complete(prefix, limit)
+
+
+class Map(MapNames):
+
+    def __init__(self):
+        MapNames.__init__(self)
         self._rooms = {}
         self._doors = {}
+        self._listeners = []
 
     def add_room(self, name):
-        if name and name not in self._rooms:  # Every room must have a name and must be unique
+        if self.check_room(name) is None:  # Every room must have a name and must be unique
             self._rooms[name] = Room(name)
+            self._name_added(name, True)
             return True
         return False
 
@@ -98,14 +212,14 @@ class Map(object):
             self.add_room(room)
 
     def add_door(self, door_name, room1, room2):
-        if not door_name or door_name in self._doors:  # Every door must have a name and must be unique
-            return False
-        if room1 not in self._rooms or room2 not in self._rooms:
-            return False  # Can not create transition because there is no specified room on the map
-        door = Door((room1, room2), door_name)
+        if self.check_door(door_name, room1, room2) is not None:
+            return False  # Every door must have a name, must be unique and must lead to existing rooms
+        door = Door((room1, room2), door_name, self._door_state_changed)
         self._doors[door_name] = door
         self._rooms[room1].add_door(door)
         self._rooms[room2].add_door(door)
+        self._name_added(door_name, False)
+        return True
 
     def get_room(self, name):
         return self._rooms.get(name, None)
@@ -113,3 +227,101 @@ class Map(object):
     def get_door(self, name):
         return self._doors.get(name, None)
 
+    def _room_names(self):
+        return self._rooms.keys()
+
+    def _door_names(self):
+        return self._doors.keys()
+
+    def rooms(self):
+        return self._rooms.values()
+
+    def doors(self):
+        return self._doors.values()
+
+    def add_listener(self, listener):
+        """Registers `listener(door)` to be called every time a door on the map changes its state.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def _door_state_changed(self, door):
+        for listener in self._listeners:
+            listener(door)
+
+
+class OverlayDoor(object):
+    """View of a door of a shared map whose state is kept by a `MapOverlay`.
+    """
+
+    __slots__ = ('_overlay', '_door')
+
+    def __init__(self, overlay, door):
+        self._overlay = overlay
+        self._door = door
+
+    def name(self):
+        return self._door.name()
+
+    def state(self):
+        return self._overlay._states.get(self._door.name(), self._door.state())
+
+    def set_state(self, state):
+        self._overlay.set_door_state(self, state)
+
+    def between(self):
+        return self._door.between()
+
+
+class MapOverlay(object):
+    """Copy-on-write view of a shared, read-only map. Rooms and doors come from the shared map, but door states
+    changed through the overlay are only stored in the overlay, so many sessions can share one ship layout.
+    """
+
+    def __init__(self, ship):
+        object.__init__(self)
+        self._map = ship
+        self._states = {}
+        self._listeners = []
+
+    def get_room(self, name):
+        return self._map.get_room(name)
+
+    def get_door(self, name):
+        door = self._map.get_door(name)
+        return None if door is None else OverlayDoor(self, door)
+
+    def find_room(self, name):
+        return self._map.find_room(name)
+
+    def find_door(self, name):
+        door = self._map.find_door(name)
+        return None if door is None else OverlayDoor(self, door)
+
+    def complete(self, prefix, limit=None):
+        return self._map.complete(prefix, limit)
+
+    def index_names(self):
+        self._map.index_names()
+
+    def rooms(self):
+        return self._map.rooms()
+
+    def doors(self):
+        return (OverlayDoor(self, door) for door in self._map.doors())
+
+    def set_door_state(self, door, state):
+        if state in (DoorState.CLOSED, DoorState.OPEN) and state != door.state():
+            self._states[door.name()] = state
+            for listener in self._listeners:
+                listener(door)
+
+    def add_listener(self, listener):
+        """Registers `listener(door)` to be called every time a door changes its state in this overlay.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
@@ -0,0 +1,201 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import collections
+import random
+import re
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+
+PREFIX_LIMIT = 64  # Maximum number of literal prefixes extracted from a single pattern.
+CACHE_SIZE = 1024  # Number of most recently matched inputs remembered by `IntentMatcher`.
+
+CacheInfo = collections.namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+def literal_prefixes(pattern, limit=PREFIX_LIMIT, prune=True):
+    """Returns the set of lower-case literal prefixes one of which every string matched by `pattern` starts with.
+    An empty string in the result means that the pattern can not be narrowed down by its first characters.
+    Unless `prune` is false, prefixes already implied by a shorter one are dropped, e.g. 'go to the' by 'go to'.
+    """
+    parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    prefixes = sorted(set(prefix for prefix, _ in _extend_prefixes({('', True)}, parsed, limit)))
+    if not prune:
+        return set(prefixes)
+    return set(prefix for i, prefix in enumerate(prefixes) if not any(prefix.startswith(shorter)
+                                                                       for shorter in prefixes[:i]))
+
+
+def _close(prefixes):
+    return set((prefix, False) for prefix, _ in prefixes)
+
+
+def _extend_prefixes(prefixes, items, limit):
+    """Walks parsed regular expression `items` and extends every still open prefix with the literals it requires.
+    """
+    for op, av in items:
+        if not any(is_open for _, is_open in prefixes):
+            break
+
+        if op is sre_parse.AT and av in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING):
+            continue  # Patterns are always matched from the beginning of the input.
+
+        if op is sre_parse.LITERAL and av < 128:
+            char = chr(av).lower()
+            extended = set((prefix + char, True) if is_open else (prefix, False) for prefix, is_open in prefixes)
+        elif op is sre_parse.SUBPATTERN:
+            extended = _extend_prefixes(prefixes, av[-1], limit)
+        elif op is sre_parse.BRANCH:
+            extended = set()
+            for branch in av[1]:
+                extended |= _extend_prefixes(prefixes, branch, limit)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            minimum, maximum, item = av
+            repeated = _extend_prefixes(prefixes, item, limit)
+            if maximum != 1:
+                repeated = _close(repeated)  # Whatever follows the first repetition is unknown.
+            extended = repeated if minimum > 0 else prefixes | repeated
+        else:
+            extended = _close(prefixes)
+
+        if len(extended) > limit:
+            return _close(prefixes)
+        prefixes = extended
+
+    return prefixes
+
+
+class IntentMatcher(object):
+    """Drop-in replacement for `nltk.chat.Chat` that compiles the whole `(pattern, responses)` table once.
+
+    Patterns are indexed in a trie by the literal prefixes they require, so only the patterns that can possibly
+    match the beginning of the input are tried. Candidates are still tried in table order, which keeps the
+    first-match-wins semantics and the `%1`, `%2`... group substitution of the original chat-bot.
+
+    The matched pattern and groups of the `cache_size` most recently used inputs are remembered, responses are
+    still picked and rendered on every call.
+    """
+
+    def __init__(self, pairs, reflections=None, cache_size=CACHE_SIZE):
+        object.__init__(self)
+        self._patterns = []
+        self._responses = []
+        self._root = ({}, [])
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+        self._hits = 0
+        self._misses = 0
+        self._reflections = reflections or {}
+        self._reflections_regex = None
+        if self._reflections:
+            words = sorted(self._reflections, key=len, reverse=True)
+            self._reflections_regex = re.compile(r'\b({})\b'.format('|'.join(map(re.escape, words))), re.IGNORECASE)
+
+        for pattern, responses in pairs:
+            self.add(pattern, responses)
+
+    def add(self, pattern, responses):
+        """Appends a new pattern to the end of the table.
+        """
+        index = len(self._patterns)
+        self._patterns.append(re.compile(pattern, re.IGNORECASE))
+        self._responses.append(responses)
+        for prefix in literal_prefixes(pattern):
+            node = self._root
+            for char in prefix:
+                node = node[0].setdefault(char, ({}, []))
+            node[1].append(index)
+        self._cache.clear()  # The new pattern could match remembered inputs that matched nothing before.
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def _candidates(self, text):
+        if not text.isascii():
+            return range(len(self._patterns))  # Case-insensitive matching of non-ASCII text is not indexed.
+
+        node = self._root
+        found = list(node[1])
+        for char in text.lower():
+            node = node[0].get(char)
+            if node is None:
+                break
+            found.extend(node[1])
+        found.sort()
+        return found
+
+    def match(self, text):
+        """Returns `(index, groups)` of the first pattern matching the `text`, or `None` if nothing matches.
+        """
+        if text in self._cache:
+            self._cache.move_to_end(text)
+            self._hits += 1
+            return self._cache[text]
+
+        self._misses += 1
+        result = self._match(text)
+        if self._cache_size > 0:
+            self._cache[text] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def cache_info(self):
+        """Returns hit and miss counts of the input cache, the same way `functools.lru_cache` does.
+        """
+        return CacheInfo(self._hits, self._misses, self._cache_size, len(self._cache))
+
+    def cache_clear(self):
+        self._cache.clear()
+        self._hits = self._misses = 0
+
+    def _match(self, text):
+        previous = None
+        for index in self._candidates(text):
+            if index != previous:
+                match = self._patterns[index].match(text)
+                if match:
+                    return index, match.groups()
+                previous = index
+        return None
+
+    def render(self, index, groups):
+        """Picks a random response of the pattern `index` and substitutes matched `groups` into it.
+        """
+        response = random.choice(self._responses[index])
+        parts = []
+        start = 0
+        position = response.find('%')
+        while position >= 0:
+            group = groups[int(response[position + 1:position + 2]) - 1]
+            parts.append(response[start:position])
+            parts.append(self._substitute(group or ''))
+            start = position + 2
+            position = response.find('%', start)
+        parts.append(response[start:])
+        response = ''.join(parts)
+
+        # Fix munged punctuation at the end, the same way `nltk.chat.Chat` does.
+        if response[-2:] == '?.':
+            response = response[:-2] + '.'
+        if response[-2:] == '??':
+            response = response[:-2] + '?'
+        return response
+
+    def respond(self, text):
+        result = self.match(text)
+        if result is None:
+            return None
+        return self.render(*result)
+
+    def _substitute(self, text):
+        text = text.lower()
+        if self._reflections_regex is None:
+            return text
+        return self._reflections_regex.sub(lambda match: self._reflections[match.group(0)], text)
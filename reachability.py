@@ -0,0 +1,233 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+from collections import deque
+
+from map import DoorState
+
+SPLIT_BUDGET = 500  # Rooms searched per closed door, and per call of `Reachability.settle`, a few milliseconds.
+
+
+class Region(object):
+    """The rooms of one region of a `Reachability`, sized and iterable like a set. It follows the labels, so it
+    changes as doors change.
+    """
+
+    __slots__ = ('_reachability', '_label')
+
+    def __init__(self, reachability, label):
+        self._reachability = reachability
+        self._label = label
+
+    def __len__(self):
+        return self._reachability._region(self._label)[0]
+
+    def __iter__(self):
+        return self._reachability._members(self._label)
+
+    def __contains__(self, room):
+        return self._reachability._peek(room) == self._label
+
+
+class Reachability(object):
+    """Keeps the rooms of a map labelled by the region of rooms connected through open doors.
+
+    The labels are built once and then updated by every door change. Opening a door merges the smaller region
+    into the larger one. Closing a door searches from both of its rooms at once: either the searches meet and
+    nothing changes, or the one that runs out of rooms first has found the smaller region, which gets a new label.
+    Only `SPLIT_BUDGET` rooms are searched right away, e.g. a door on a long cycle leaves the rest to `settle`,
+    and questions about a region with searches still going on finish them first. Any door change starts the
+    searches that are going on again, as what they found may not hold anymore. Until they are done, a region may
+    hold rooms that are not connected anymore, but rooms in different regions never are.
+
+    A region is kept as its number of rooms and a few sets of room names, which may still hold rooms that moved
+    to other regions since, so merging and splitting never copy the larger side. Given the `base` labels of the
+    map a `map.MapOverlay` is made from, only the labels and regions changed in the overlay are kept; the base
+    map must not change afterwards.
+    """
+
+    def __init__(self, ship, base=None):
+        object.__init__(self)
+        self._map = ship
+        self._base = base
+        self._labels = {}   # room name -> region label, only the changed ones if there is a base
+        self._regions = {}  # region label -> [room count, list of sets of room names], likewise
+        self._pending = []  # [room1, room2, searches] of closed doors whose rooms may not be connected anymore
+        if base is not None:
+            base.settle(float('inf'))  # The overlay starts from exact labels.
+        self._next_label = base._next_label if base is not None else 0
+        if base is None:
+            for room in ship.rooms():
+                name = room.name()
+                if name not in self._labels:
+                    self._new_region(self._search(name))
+        ship.add_listener(self._on_door_state_changed)
+
+    def is_reachable(self, source, target):
+        """Whether the room `target` can be reached from the room `source` through open doors.
+        """
+        label = self._label(source)
+        if label != self._label(target):
+            return False
+        self._finish(label)
+        return self._label(source) == self._label(target)
+
+    def reachable(self, room):
+        """Returns the `Region` of all rooms reachable from the `room`, including itself.
+        """
+        self._finish(self._label(room))
+        return Region(self, self._label(room))
+
+    def settling(self):
+        """Whether searches after closed doors are still going on, see `settle`.
+        """
+        return bool(self._pending)
+
+    def settle(self, budget=SPLIT_BUDGET):
+        """Goes on with the searches after closed doors for about `budget` rooms. Returns whether they go on.
+        """
+        while self._pending and budget > 0:
+            budget, done = self._advance(self._pending[0], budget)
+            if done:
+                self._pending.pop(0)
+        return bool(self._pending)
+
+    def _finish(self, label):
+        for check in [check for check in self._pending if self._label(check[0]) == label]:
+            self._advance(check, float('inf'))
+            self._pending.remove(check)
+
+    def _peek(self, room):
+        label = self._labels.get(room)
+        if label is None and self._base is not None:
+            label = self._base._labels.get(room)
+        return label
+
+    def _label(self, room):
+        label = self._peek(room)
+        if label is None:  # A room added after the labels were built.
+            label = self._new_region({room})
+        return label
+
+    def _region(self, label):
+        region = self._regions.get(label)
+        if region is None and self._base is not None:
+            region = self._base._regions[label]
+        return region
+
+    def _own_region(self, label):
+        """Returns the region of `label` to be changed, copying the list of sets of a base region.
+        """
+        region = self._regions.get(label)
+        if region is None:
+            count, parts = self._base._regions[label]
+            region = self._regions[label] = [count, list(parts)]
+        return region
+
+    def _members(self, label):
+        parts = self._region(label)[1]
+        if len(parts) == 1:
+            return (room for room in parts[0] if self._peek(room) == label)
+        return self._unique_members(label, parts)
+
+    def _unique_members(self, label, parts):
+        seen = set()
+        for part in parts:
+            for room in part:
+                if room not in seen and self._peek(room) == label:
+                    seen.add(room)
+                    yield room
+
+    def _new_region(self, rooms):
+        label = self._next_label
+        self._next_label += 1
+        self._regions[label] = [len(rooms), [rooms]]
+        for room in rooms:
+            self._labels[room] = label
+        return label
+
+    def _open_neighbours(self, room):
+        get_door = self._map.get_door
+        for neighbour, doors in self._map.get_room(room).possible_transitions().items():
+            for door in doors:
+                if get_door(door).state() == DoorState.OPEN:
+                    yield neighbour
+                    break
+
+    def _search(self, room):
+        seen = {room}
+        queue = deque(seen)
+        while queue:
+            for neighbour in self._open_neighbours(queue.popleft()):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return seen
+
+    def _on_door_state_changed(self, door):
+        room1, room2 = door.between()
+        if room1 == room2:
+            return
+
+        for check in self._pending:
+            check[2] = self._searches(check[0], check[1])
+
+        label1, label2 = self._label(room1), self._label(room2)
+        if door.state() == DoorState.OPEN:
+            if label1 != label2:
+                if self._region(label1)[0] < self._region(label2)[0]:
+                    label1, label2 = label2, label1
+                merged = list(self._members(label2))
+                for room in merged:
+                    self._labels[room] = label1
+                region = self._own_region(label1)
+                region[0] += len(merged)
+                region[1].extend(self._region(label2)[1])
+                self._regions.pop(label2, None)
+        elif label1 == label2:
+            check = [room1, room2, self._searches(room1, room2)]
+            if not self._advance(check, SPLIT_BUDGET)[1]:
+                self._pending.append(check)
+
+    @staticmethod
+    def _searches(room1, room2):
+        return ({room1}, deque((room1,))), ({room2}, deque((room2,)))
+
+    def _advance(self, check, budget):
+        """Interleaved breadth-first searches from both rooms of a closed door, for about `budget` rooms.
+        Returns the budget left and whether the searches are done.
+        """
+        searches = check[2]
+        while budget > 0:
+            for side in (0, 1):
+                seen, queue = searches[side]
+                other = searches[1 - side][0]
+                if not queue:
+                    self._split(seen, check[1 - side], check)
+                    return budget, True
+                budget -= 1
+                for neighbour in self._open_neighbours(queue.popleft()):
+                    if neighbour in other:
+                        return budget, True  # Both rooms are still connected.
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        queue.append(neighbour)
+        return budget, False
+
+    def _split(self, rooms, kept, done):
+        """Moves the `rooms` of a region that got cut off from the room `kept` into a region of their own. The
+        searches of other doors between the rooms and the rest of the region search from `kept` instead, so
+        they still find out whether the rest of the region fell apart.
+        """
+        for check in self._pending:
+            if check is not done and (check[0] in rooms) != (check[1] in rooms):
+                check[check[0] not in rooms] = kept
+                check[2] = self._searches(check[0], check[1])
+        label = self._label(next(iter(rooms)))
+        region = self._own_region(label)
+        self._new_region(rooms)
+        region[0] -= len(rooms)
+        if sum(len(part) for part in region[1]) > 4 * region[0] + 64:
+            region[1] = [set(self._members(label))]  # Most of the rooms of the sets have moved away.
@@ -0,0 +1,256 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import heapq
+
+from collections import OrderedDict
+
+from map import DoorState
+
+
+GROW_BUDGET = 250  # Rooms attached or searched again per call of `RoutePlanner.grow`, a few milliseconds.
+
+
+class RoutePlanner(object):
+    """Finds the shortest routes between rooms of a `map.Map` that only go through open doors.
+
+    Routes are found by a bidirectional breadth-first search, which stops as soon as both searches meet. Sources
+    asked for again get a shortest-path tree, which is built off the input path by `grow`, a bounded number of
+    rooms at a time, and answers later routes from or to its source once complete. When a door changes its state
+    the trees are repaired the same way: opening a door queues the rooms that got closer, closing a door queues
+    the subtree that hung under it to be dropped and attached again. Until the work queued for a tree is done,
+    routes are searched instead.
+    """
+
+    def __init__(self, ship, cache_size=16):
+        object.__init__(self)
+        self._map = ship
+        self._cache_size = cache_size
+        self._trees = OrderedDict()  # source room name -> (distances, parents, children)
+        self._work = OrderedDict()  # source room name -> (cuts, orphans, heap) of trees that are not complete yet
+        self._sources = OrderedDict()  # Recent sources without a tree, they get one when asked for again.
+        ship.add_listener(self._on_door_state_changed)
+
+    def route(self, source, target):
+        """Returns the list of `(door_name, room_name)` steps leading from `source` to `target`, an empty list if
+        both are the same room or `None` if the target can not be reached through open doors.
+        """
+        if self._map.get_room(source) is None or self._map.get_room(target) is None:
+            return None
+
+        if source in self._trees and source not in self._work:
+            self._trees.move_to_end(source)
+            steps = self._walk(self._trees[source], target)
+            if steps is None:
+                return None
+            # The tree leads back to the source, so the walk has to be reversed.
+            rooms = [room for _, room in steps]
+            rooms.insert(0, target)
+            return [(door, room) for (door, _), room in zip(reversed(steps), reversed(rooms[:-1]))]
+
+        if target in self._trees and target not in self._work:
+            self._trees.move_to_end(target)
+            return self._walk(self._trees[target], source)
+
+        if source in self._sources:
+            del self._sources[source]
+            self._plant(source)
+        elif source not in self._trees:
+            self._sources[source] = None
+            if len(self._sources) > self._cache_size:
+                self._sources.popitem(last=False)
+        return self._search(source, target)
+
+    def distance(self, source, target):
+        """Number of doors on the shortest open route, `None` if there is no such route.
+        """
+        steps = self.route(source, target)
+        return None if steps is None else len(steps)
+
+    def growing(self):
+        """Returns whether trees are waiting for `grow` to build or repair them.
+        """
+        return bool(self._work)
+
+    def grow(self, budget=GROW_BUDGET):
+        """Builds and repairs the trees, attaching or searching again at most about `budget` rooms. Returns
+        whether work is left for the next call.
+        """
+        while budget > 0 and self._work:
+            source, work = next(iter(self._work.items()))
+            budget = self._settle(self._trees[source], work, budget)
+            if not any(work):
+                del self._work[source]
+        return bool(self._work)
+
+    def _search(self, source, target):
+        """Bidirectional breadth-first search, one whole level of the side with the smaller frontier at a time.
+        All meetings found within the level that first meets lie on shortest routes.
+        """
+        if source == target:
+            return []
+        get_room = self._map.get_room
+        forward, backward = {source: None}, {target: None}  # room -> (room towards the start, door)
+        frontiers = [[source], [target]]
+        while frontiers[0] and frontiers[1]:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            parents, others = (forward, backward) if side == 0 else (backward, forward)
+            level = []
+            for room in frontiers[side]:
+                for neighbour, doors in get_room(room).possible_transitions().items():
+                    if neighbour not in parents:
+                        door = self._open_door(doors)
+                        if door is not None:
+                            parents[neighbour] = (room, door)
+                            if neighbour in others:
+                                return self._join(forward, backward, neighbour)
+                            level.append(neighbour)
+            frontiers[side] = level
+        return None
+
+    @staticmethod
+    def _join(forward, backward, meeting):
+        """Returns the steps from the start of the `forward` search over the `meeting` room to the start of the
+        `backward` search.
+        """
+        rooms, doors = [meeting], []
+        while forward[rooms[-1]] is not None:
+            room, door = forward[rooms[-1]]
+            rooms.append(room)
+            doors.append(door)
+        steps = list(zip(reversed(doors), reversed(rooms[:-1])))
+        room = meeting
+        while backward[room] is not None:
+            room, door = backward[room]
+            steps.append((door, room))
+        return steps
+
+    def _walk(self, tree, room):
+        """Follows the parents of `room` up to the root of the `tree` and returns the steps taken.
+        """
+        distances, parents, _ = tree
+        if room not in distances:
+            return None
+        steps = []
+        while room in parents:
+            room, door = parents[room]
+            steps.append((door, room))
+        return steps
+
+    def _plant(self, source):
+        """Starts the tree of `source` with the source alone, `grow` attaches the other rooms.
+        """
+        tree = self._trees[source] = ({source: 0}, {}, {})
+        heap = []
+        self._work[source] = ([], [], heap)
+        self._expand(tree, heap, source)
+        if len(self._trees) > self._cache_size:
+            evicted, _ = self._trees.popitem(last=False)
+            self._work.pop(evicted, None)
+
+    @staticmethod
+    def _attach(tree, room, parent, door):
+        """Makes `parent` the parent of `room` in the `tree`, reached through the `door`.
+        """
+        distances, parents, children = tree
+        previous = parents.get(room)
+        if previous is not None:
+            children[previous[0]].discard(room)
+        parents[room] = (parent, door)
+        children.setdefault(parent, set()).add(room)
+        distances[room] = distances[parent] + 1
+
+    def _expand(self, tree, heap, room):
+        """Queues the neighbours of `room` that get closer to the source through it.
+        """
+        distances = tree[0]
+        distance = distances[room] + 1
+        for neighbour, doors in self._map.get_room(room).possible_transitions().items():
+            if distances.get(neighbour, distance + 1) > distance:
+                door = self._open_door(doors)
+                if door is not None:
+                    heapq.heappush(heap, (distance, neighbour, room, door))
+
+    def _settle(self, tree, work, budget):
+        """Repairs and grows the `tree` by the `work` queued for it, handling about `budget` rooms. Returns the
+        budget left.
+
+        The work is done in three stages, each one only once the previous is done. The subtrees under the `cuts`
+        are dropped and their rooms become `orphans`, orphans get offers from their neighbours left in the tree,
+        and the `heap` of `(distance, room, parent, door)` offers is settled by Dijkstra with unit weights. Offers
+        that are outdated, because the parent moved or the door closed meanwhile, are skipped.
+        """
+        cuts, orphans, heap = work
+        distances, parents, children = tree
+        while cuts and budget > 0:
+            member = cuts.pop()
+            budget -= 1
+            if member in parents:
+                cuts.extend(children.pop(member, ()))
+                del distances[member]
+                del parents[member]
+                orphans.append(member)
+
+        get_room = self._map.get_room
+        while orphans and budget > 0 and not cuts:
+            member = orphans.pop()
+            budget -= 1
+            if member in distances:
+                continue
+            for neighbour, doors in get_room(member).possible_transitions().items():
+                if neighbour in distances:
+                    door = self._open_door(doors)
+                    if door is not None:
+                        heapq.heappush(heap, (distances[neighbour] + 1, member, neighbour, door))
+
+        get_door = self._map.get_door
+        while heap and budget > 0 and not cuts and not orphans:
+            distance, room, parent, door = heapq.heappop(heap)
+            if distances.get(room, distance + 1) <= distance or distances.get(parent) != distance - 1:
+                continue
+            if get_door(door).state() != DoorState.OPEN:
+                door = self._open_door(get_room(room).get_doors(parent))  # A parallel door may still be open.
+                if door is None:
+                    continue
+            self._attach(tree, room, parent, door)
+            self._expand(tree, heap, room)
+            budget -= 1
+        return budget
+
+    @staticmethod
+    def _cut(tree, cuts, room):
+        """Detaches `room` from its parent after the door between them closed, `grow` drops the subtree under it.
+        Rooms outside the subtree keep their distances, as closing a door makes no other way shorter.
+        """
+        _, parents, children = tree
+        children.get(parents[room][0], set()).discard(room)
+        cuts.append(room)
+
+    def _open_door(self, doors):
+        get_door = self._map.get_door
+        for door in doors:
+            if get_door(door).state() == DoorState.OPEN:
+                return door
+        return None
+
+    def _on_door_state_changed(self, door):
+        room1, room2 = door.between()
+        name = door.name()
+        is_open = door.state() == DoorState.OPEN
+
+        for source, tree in self._trees.items():
+            distances, parents, _ = tree
+            for room, neighbour in ((room1, room2), (room2, room1)):
+                if is_open:
+                    if room in distances and distances.get(neighbour, distances[room] + 2) > distances[room] + 1:
+                        heap = self._work.setdefault(source, ([], [], []))[2]
+                        heapq.heappush(heap, (distances[room] + 1, neighbour, room, name))
+                elif parents.get(room) == (neighbour, name):
+                    parallel = self._open_door(self._map.get_room(room).get_doors(neighbour))
+                    if parallel is not None:
+                        parents[room] = (neighbour, parallel)  # A parallel door is still open.
+                    else:
+                        self._cut(tree, self._work.setdefault(source, ([], [], []))[0], room)
+                    break
@@ -0,0 +1,149 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import itertools
+import time
+
+SLOT_BITS = 8                   # Every wheel has 256 slots,
+SLOTS = 1 << SLOT_BITS
+SLOT_MASK = SLOTS - 1
+LEVELS = 4                      # and four wheels cover 2 ** 32 ticks, beyond that timers are cascaded again.
+RESOLUTION = 0.25               # Seconds per tick.
+
+
+class Timer(object):
+    """Handle of an action scheduled by `Scheduler.schedule`.
+    """
+
+    __slots__ = ('_scheduler', '_slot', 'due', 'tick', 'order', 'action', 'args')
+
+    def __init__(self, scheduler, due, tick, order, action, args):
+        self._scheduler = scheduler
+        self._slot = None   # Dictionary of the wheel slot holding the timer, `None` once fired or cancelled.
+        self.due = due
+        self.tick = tick
+        self.order = order
+        self.action = action
+        self.args = args
+
+    def pending(self):
+        return self._slot is not None
+
+    def cancel(self):
+        """Removes the timer from its wheel, does nothing if it has already fired or been cancelled.
+        """
+        if self._slot is not None:
+            del self._slot[self]
+            self._slot = None
+            self._scheduler._count -= 1
+
+
+class Scheduler(object):
+    """Runs actions after a delay, using a hierarchical timer wheel.
+
+    Time is counted in ticks of `resolution` seconds. The first wheel holds one slot per tick for the next 256
+    ticks, every further wheel holds slots 256 times longer than the previous one. Timers far ahead wait in the
+    upper wheels and are moved to a lower one whenever the wheel below wraps around. Scheduling and cancelling
+    take constant time, and advancing the time only costs the ticks passed and the timers that are due, however
+    many timers are pending.
+    """
+
+    def __init__(self, resolution=RESOLUTION, clock=time.monotonic):
+        object.__init__(self)
+        self._resolution = resolution
+        self._clock = clock
+        self._start = clock()
+        self._tick = 0      # Current tick, all timers due in earlier ticks have fired.
+        self._cascaded = 0  # Last tick the upper wheels were cascaded at.
+        self._wheels = [[{} for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self._count = 0
+        self._order = itertools.count()  # Timers due at the same time fire in the order they were scheduled.
+
+    def __len__(self):
+        return self._count
+
+    def schedule(self, delay, action, *args):
+        """Calls `action(*args)` from `advance` once `delay` seconds have passed, returns its `Timer`.
+        """
+        due = self._clock() + max(0.0, delay)
+        timer = Timer(self, due, int((due - self._start) / self._resolution), next(self._order), action, args)
+        self._insert(timer)
+        self._count += 1
+        return timer
+
+    def _insert(self, timer):
+        tick = max(timer.tick, self._tick)
+        delta = tick - self._tick
+        level = 0
+        while delta >= SLOTS and level < LEVELS - 1:
+            delta >>= SLOT_BITS
+            level += 1
+        if level == LEVELS - 1 and delta >= SLOTS:
+            tick = self._tick + (SLOTS << (SLOT_BITS * level)) - 1  # Too far ahead, cascaded again later.
+        slot = self._wheels[level][(tick >> (SLOT_BITS * level)) & SLOT_MASK]
+        slot[timer] = None
+        timer._slot = slot
+
+    def advance(self, now=None):
+        """Fires all timers due by `now`, by default the current time of the clock, and returns their number.
+        """
+        now = self._clock() if now is None else now
+        target = int((now - self._start) / self._resolution)
+        fired = 0
+        while self._count:
+            tick = self._tick
+            if self._cascaded != tick:
+                self._cascaded = tick
+                for level in range(LEVELS - 1, 0, -1):
+                    if not tick & ((1 << (SLOT_BITS * level)) - 1):
+                        self._cascade(level, (tick >> (SLOT_BITS * level)) & SLOT_MASK)
+
+            slot = self._wheels[0][tick & SLOT_MASK]
+            if tick < target:
+                # The whole tick has passed, timers scheduled by the actions are due at the next one at the earliest.
+                self._tick = tick + 1
+                if slot:
+                    fired += self._fire(slot, tick)
+            else:
+                # The current tick is only fired up to `now`, the rest of it stays in place.
+                if slot:
+                    fired += self._fire(slot, tick, now)
+                break
+        else:
+            self._tick = max(self._tick, target)  # Nothing to wait for, the wheels can skip ahead.
+        return fired
+
+    def _cascade(self, level, index):
+        slot = self._wheels[level][index]
+        if slot:
+            self._wheels[level][index] = {}
+            for timer in slot:
+                self._insert(timer)
+
+    def _fire(self, slot, tick, now=None):
+        timers = sorted(slot, key=lambda timer: (timer.due, timer.order))
+        if now is not None:
+            timers = [timer for timer in timers if timer.due <= now]
+        fired = 0
+        try:
+            for timer in timers:
+                if timer._slot is not slot:
+                    continue  # Cancelled by one of the actions fired before.
+                del slot[timer]
+                if timer.tick > tick:
+                    self._insert(timer)  # Further ahead than the wheels reach, see `_insert`.
+                    continue
+                timer._slot = None
+                self._count -= 1
+                fired += 1
+                timer.action(*timer.args)
+        finally:
+            # If an action raised, the remaining timers of a passed tick fire at the next one.
+            if tick < self._tick:
+                for timer in timers:
+                    if timer._slot is slot:
+                        del slot[timer]
+                        self._insert(timer)
+        return fired
@@ -0,0 +1,147 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Hosts many HAL9000 operator sessions over a local socket.
+
+All sessions share one read-only ship layout, its regions of rooms connected through open doors and one compiled
+chat-bot. Every session only keeps its own location, a `map.MapOverlay` with the doors it changed and the regions
+these doors changed. The protocol is line based: a client sends one input
+per line (commands start with `/`, `/quit` closes the session) and receives one JSON line per input:
+
+    {"input": "open gate 1", "responses": [{"text": "The gate 1 is now open.", "align": "right", ...}]}
+
+Responses of scheduled actions, e.g. of `/after 10 where`, are sent when they fire, as JSON lines without an
+input: {"responses": [...]}.
+
+    python server.py --socket /tmp/hal9000.sock
+    python server.py --measure 1000
+"""
+
+import argparse
+import asyncio
+import json
+import tracemalloc
+
+from compact_map import CompactMap
+from headless import TextEvent
+from layout import LayoutError
+from main import HAL9000, create_ship
+from map import Map, MapOverlay
+from reachability import Reachability
+from worker import BufferedTerminal
+
+
+class SessionServer(object):
+    """Creates a lightweight HAL9000 for every connection on top of the shared `ship` and `chatbot`.
+    """
+
+    def __init__(self, ship, chatbot=None):
+        object.__init__(self)
+        self._ship = ship
+        self._chatbot = chatbot if chatbot is not None else HAL9000.create_chatbot()
+        self._reachability = Reachability(ship)  # Labelled once, sessions only keep what their doors changed.
+        ship.index_names()  # Misspelled names of any session are looked up without building the indices first.
+        self.sessions = 0
+
+    def create_session(self):
+        """Returns the `(agent, terminal)` pair of a new session.
+        """
+        terminal = BufferedTerminal()
+        overlay = MapOverlay(self._ship)
+        agent = HAL9000(terminal, overlay, self._chatbot, reachability=Reachability(overlay, self._reachability))
+        return agent, terminal
+
+    async def handle(self, reader, writer):
+        agent, terminal = self.create_session()
+        updates = []  # The task calling `agent.update`, only running while the agent has an update interval.
+
+        def on_update_interval():
+            if agent.update_interval is not None and (not updates or updates[0].done()):
+                updates[:] = [asyncio.ensure_future(self._update(agent, terminal, writer))]
+        agent.on_update_interval = on_update_interval
+        agent.on_quit = writer.close  # E.g. `/after 5 quit`, the session ends as the connection closes.
+
+        self.sessions += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                text = line.decode('utf-8').strip()
+                if not text:
+                    continue
+                if text.split()[0] == '/quit':
+                    break
+                if text.startswith('/'):
+                    agent.on_command(TextEvent(text[1:]))
+                else:
+                    agent.on_input(TextEvent(text))
+                writer.write((json.dumps({'input': text, 'responses': terminal.flush()}) + '\n').encode('utf-8'))
+                await writer.drain()
+        finally:
+            self.sessions -= 1
+            if updates:
+                updates[0].cancel()
+            writer.close()
+
+    @staticmethod
+    async def _update(agent, terminal, writer):
+        """Updates the `agent` every `update_interval` seconds until it has nothing left to update, and sends the
+        responses of the actions that fired.
+        """
+        while agent.update_interval is not None:
+            await asyncio.sleep(agent.update_interval)
+            agent.update(None)
+            responses = terminal.flush()
+            if responses and not writer.is_closing():
+                writer.write((json.dumps({'responses': responses}) + '\n').encode('utf-8'))
+                await writer.drain()
+
+    async def serve(self, socket_path=None, port=None):
+        if socket_path:
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        else:
+            server = await asyncio.start_server(self.handle, host='127.0.0.1', port=port)
+        async with server:
+            await server.serve_forever()
+
+
+def measure_session_memory(server, count):
+    """Returns the average number of bytes allocated by one of `count` new sessions.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [server.create_session() for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del sessions
+    return size / float(count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve HAL9000 sessions over a local socket.')
+    parser.add_argument('--socket', default='/tmp/hal9000.sock', help='unix socket path to listen on')
+    parser.add_argument('--port', type=int, help='listen on this localhost TCP port instead of a unix socket')
+    parser.add_argument('--layout', help='load the ship from a text or compiled layout file')
+    parser.add_argument('--compact-map', action='store_true', help='use the array-backed map for large ships')
+    parser.add_argument('--measure', type=int, metavar='SESSIONS',
+                        help='print the memory used per session for this many sessions and exit')
+    args = parser.parse_args()
+
+    try:
+        ship = create_ship(args.layout, CompactMap if args.compact_map else Map)
+    except LayoutError as error:
+        parser.exit(1, '{}:{}\n'.format(args.layout, error))
+    server = SessionServer(ship)
+
+    if args.measure:
+        print('{:.0f} bytes per session'.format(measure_session_memory(server, args.measure)))
+        return
+
+    asyncio.run(server.serve(None if args.port else args.socket, args.port))
+
+
+if __name__ == '__main__':
+    main()
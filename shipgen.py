@@ -0,0 +1,229 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Generates large ships and operator conversations for scaling tests, streaming both line by line.
+
+Ships are text layouts as read by `layout.load_text_layout`. A spine of corridors is joined by gates, every
+corridor has a row of cabins behind hatches, and vent flaps join random pairs of rooms. Conversations are
+transcripts as replayed by `headless.py`: an operator walking along the spine and into cabins, mixing commands
+with chit-chat for the patterns of `HAL9000._responses`. Generating the same ship arguments twice gives the same
+ship, so the conversations can be generated separately and still match it:
+
+    python shipgen.py ship --rooms 1000000 --output ship.jsonl
+    python shipgen.py talk --rooms 1000000 --utterances 10000000 --output talk.txt
+    python headless.py talk.txt --layout ship.jsonl --compact-map
+"""
+
+import argparse
+import json
+import random
+import sys
+
+CABINS = 8          # Cabins along every corridor.
+VENTS = 0.5         # Vent flaps per room.
+OPEN_DOORS = 0.25   # Share of the doors that are initially open.
+MASK = (1 << 64) - 1
+
+CHIT_CHAT = ('hello', 'hi', 'hey you!', 'good morning', 'good evening', 'hal.', 'ok', 'o.k.', 'cool', 'excellent',
+             'really?', 'are you serious?', 'sing me a song', 'what is the meaning of life', 'open the pod bay doors')
+
+
+def _mix(value):
+    """SplitMix64 finalizer: a well distributed 64 bit hash of an integer, so that random choices about doors can
+    be recomputed from their index instead of being stored.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+class ShipTopology(object):
+    """Layout of a generated ship, computed from room and door indices alone.
+
+    Room `index` is a corridor if it is a multiple of `cabins + 1`, and a cabin of the corridor before it otherwise.
+    Corridor `k` is joined to corridor `k - 1` by gate `k`, cabin `index` to its corridor by hatch `index`. There
+    are `vents * rooms` vent flaps between pseudo-random pairs of rooms, and every door is open with the
+    probability `open_doors`, both derived from the `seed`.
+    """
+
+    def __init__(self, rooms, cabins=CABINS, vents=VENTS, open_doors=OPEN_DOORS, seed=0):
+        object.__init__(self)
+        if rooms < 2:
+            raise ValueError('a ship needs at least two rooms')
+        self.rooms = rooms
+        self.cabins = cabins
+        self.vent_flaps = int(vents * rooms)
+        self.open_doors = open_doors
+        self.seed = seed
+
+    def _hash(self, kind, index):
+        return _mix((self.seed << 2 | kind) << 32 | index)
+
+    def corridor_of(self, room):
+        return room - room % (self.cabins + 1)
+
+    def room_name(self, room):
+        if room % (self.cabins + 1):
+            return 'cabin {}'.format(room)
+        return 'corridor {}'.format(room // (self.cabins + 1))
+
+    def is_open(self, kind, index):
+        return self._hash(kind, index) < self.open_doors * 2.0 ** 64
+
+    def vent(self, index):
+        """Returns the two rooms joined by vent flap `index`.
+        """
+        value = self._hash(3, index)
+        room1 = value % self.rooms
+        room2 = (room1 + 1 + (value >> 32) % (self.rooms - 1)) % self.rooms
+        return room1, room2
+
+    def neighbours(self, room):
+        """Yields `(door name, room)` for the gates and hatches of the `room`. Vent flaps are left out, as they
+        can only be found by going through all of them.
+        """
+        step = self.cabins + 1
+        if room % step:
+            yield 'hatch {}'.format(room), self.corridor_of(room)
+            return
+        corridor = room // step
+        if corridor:
+            yield 'gate {}'.format(corridor), room - step
+        for cabin in range(room + 1, min(room + step, self.rooms)):
+            yield 'hatch {}'.format(cabin), cabin
+        if room + step < self.rooms:
+            yield 'gate {}'.format(corridor + 1), room + step
+
+    def records(self):
+        """Yields the layout records: the rooms and doors of every corridor, then all vent flaps.
+        """
+        step = self.cabins + 1
+        for corridor in range(0, self.rooms, step):
+            for room in range(corridor, min(corridor + step, self.rooms)):
+                yield {'room': self.room_name(room)}
+            if corridor:
+                yield self._door(0, corridor // step, 'gate', corridor - step, corridor)
+            for cabin in range(corridor + 1, min(corridor + step, self.rooms)):
+                yield self._door(1, cabin, 'hatch', corridor, cabin)
+        for index in range(self.vent_flaps):
+            yield self._door(2, index, 'vent flap', *self.vent(index))
+
+    def _door(self, kind, index, prefix, room1, room2):
+        record = {'door': '{} {}'.format(prefix, index), 'between': [self.room_name(room1), self.room_name(room2)]}
+        if self.is_open(kind, index):
+            record['state'] = 'open'
+        return record
+
+    def layout_lines(self):
+        """Yields the layout as JSON lines, see `layout.load_text_layout`.
+        """
+        for record in self.records():
+            yield json.dumps(record)
+
+
+class Conversation(object):
+    """Operator transcript for a `ShipTopology`, generated one utterance at a time.
+
+    The operator walks the ship: every move opens the door to a neighbouring room before going there, and
+    sometimes closes it behind. In between, it asks where it is, how to get to rooms nearby and whether they
+    are reachable, and chats. Commands are typed either as `/commands` or in words, so both paths are exercised.
+    Only the current room is remembered, however long the conversation.
+    """
+
+    NEARBY = 64  # Rooms asked about are at most this many indices away.
+
+    def __init__(self, topology, seed=0):
+        object.__init__(self)
+        self._ship = topology
+        self._random = random.Random(seed)
+        self._room = 0
+        self._behind = None  # Door to close after a move.
+
+    def __iter__(self):
+        choose = self._random.random
+        while True:
+            roll = choose()
+            if roll < 0.35:
+                for line in self._move():
+                    yield line
+            elif roll < 0.45 and self._behind is not None:
+                yield self._say('/close {}', 'close {}', 'please close {}').format(self._behind)
+                self._behind = None
+            elif roll < 0.55:
+                yield self._say('/where', 'where am i?')
+            elif roll < 0.65:
+                yield self._say('/where {}', 'how can i get to the {}?').format(self._nearby())
+            elif roll < 0.70:
+                yield self._say('/reachable {}', 'can i get to the {}?').format(self._nearby())
+            elif roll < 0.75:
+                yield self._say('/transitions', 'where can i go?', '/where {}').format(
+                    self._ship.room_name(self._room))
+            else:
+                yield self._random.choice(CHIT_CHAT)
+
+    def _move(self):
+        door, room = self._random.choice(list(self._ship.neighbours(self._room)))
+        yield self._say('/open {}', 'open {}', 'please open {}').format(door)
+        yield self._say('/goto {}', 'go to the {}', 'take me to {}', 'i want to go to {}').format(
+            self._ship.room_name(room))
+        self._room = room
+        self._behind = door if self._random.random() < 0.5 else None
+
+    def _nearby(self):
+        room = self._room + self._random.randint(-self.NEARBY, self.NEARBY)
+        return self._ship.room_name(min(max(room, 0), self._ship.rooms - 1))
+
+    def _say(self, *forms):
+        return self._random.choice(forms)
+
+    def lines(self, utterances):
+        """Yields the first `utterances` lines of the conversation.
+        """
+        for number, line in enumerate(self):
+            if number == utterances:
+                return
+            yield line
+
+
+def _write(lines, path):
+    output = open(path, 'w', encoding='utf-8') if path else sys.stdout
+    try:
+        for line in lines:
+            output.write(line + '\n')
+    finally:
+        if path:
+            output.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate ships and operator conversations for scaling tests.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    ship_parser = subparsers.add_parser('ship', help='write a text layout')
+    talk_parser = subparsers.add_parser('talk', help='write a transcript matching the ship of the same arguments')
+    talk_parser.add_argument('--utterances', type=int, default=1000, help='length of the transcript')
+    talk_parser.add_argument('--talk-seed', type=int, default=0, help='seed of the conversation')
+    for subparser in (ship_parser, talk_parser):
+        subparser.add_argument('--rooms', type=int, default=1000, help='number of rooms')
+        subparser.add_argument('--cabins', type=int, default=CABINS, help='cabins along every corridor')
+        subparser.add_argument('--vents', type=float, default=VENTS, help='vent flaps per room')
+        subparser.add_argument('--open', type=float, default=OPEN_DOORS, help='share of initially open doors')
+        subparser.add_argument('--seed', type=int, default=0, help='seed of the ship')
+        subparser.add_argument('--output', help='write here instead of the standard output')
+    args = parser.parse_args()
+
+    try:
+        topology = ShipTopology(args.rooms, args.cabins, args.vents, args.open, args.seed)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.command == 'ship':
+        _write(topology.layout_lines(), args.output)
+    else:
+        _write(Conversation(topology, args.talk_seed).lines(args.utterances), args.output)
+
+
+if __name__ == '__main__':
+    main()
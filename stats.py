@@ -0,0 +1,179 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import collections
+import csv
+import json
+import math
+import time
+
+RESOLUTION = 1e-6        # Durations shorter than a microsecond all fall into the first bucket.
+BUCKETS_PER_DOUBLING = 8  # Relative error of the percentiles is below 1 / BUCKETS_PER_DOUBLING.
+FRAMES = 36000            # Frames kept by `FrameMetrics`, ten minutes at 60 frames per second.
+
+
+class LatencyHistogram(object):
+    """Counts durations in logarithmic buckets, so that percentiles can be estimated in constant memory.
+    """
+
+    def __init__(self):
+        object.__init__(self)
+        self._buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        if seconds < RESOLUTION:
+            bucket = 0
+        else:
+            mantissa, exponent = math.frexp(seconds / RESOLUTION)
+            bucket = (exponent - 1) * BUCKETS_PER_DOUBLING + int((2.0 * mantissa - 1.0) * BUCKETS_PER_DOUBLING) + 1
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    @staticmethod
+    def _upper_bound(bucket):
+        if bucket == 0:
+            return RESOLUTION
+        exponent, step = divmod(bucket - 1, BUCKETS_PER_DOUBLING)
+        return RESOLUTION * 2.0 ** exponent * (1.0 + (step + 1.0) / BUCKETS_PER_DOUBLING)
+
+    def percentile(self, percent):
+        """Returns an upper estimate of the duration `percent` of all durations do not exceed.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(math.ceil(self.count * percent / 100.0)))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(self._upper_bound(bucket), self.maximum)
+        return self.maximum
+
+
+class LatencyRecorder(object):
+    """Keeps a `LatencyHistogram` per name, e.g. per command of the agent.
+    """
+
+    def __init__(self):
+        object.__init__(self)
+        self._histograms = {}
+
+    def add(self, name, seconds):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram()
+        histogram.add(seconds)
+
+    def timed(self, name, function):
+        """Returns a wrapper of `function` that records the duration of every call under `name`.
+        """
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - started)
+        return wrapper
+
+    def summary(self):
+        """Returns `{name: {'count', 'mean', 'p50', 'p95', 'p99', 'max'}}` with durations in seconds.
+        """
+        return dict((name, {'count': histogram.count,
+                            'mean': histogram.total / histogram.count,
+                            'p50': histogram.percentile(50),
+                            'p95': histogram.percentile(95),
+                            'p99': histogram.percentile(99),
+                            'max': histogram.maximum})
+                    for name, histogram in self._histograms.items())
+
+    def dump(self, stream):
+        """Writes the `summary` as JSON into a text `stream`.
+        """
+        json.dump(self.summary(), stream, indent=1, sort_keys=True)
+        stream.write('\n')
+
+
+class FrameMetrics(object):
+    """Rolling record of the rendering cost of the last `frames` frames of a window.
+
+    Every frame keeps the time it ended, how long it took to draw, the number of visuals, how many visuals had to
+    lay their text out again, and the cost of the timer and event callbacks that ran since the previous frame,
+    by name. Callback names start with `timer:` or `event:`, which `summary` adds up separately.
+    """
+
+    def __init__(self, frames=FRAMES):
+        object.__init__(self)
+        self._frames = collections.deque(maxlen=frames)
+        self._costs = {}
+        self._started = None
+
+    def __len__(self):
+        return len(self._frames)
+
+    def add_cost(self, name, seconds):
+        self._costs[name] = self._costs.get(name, 0.0) + seconds
+
+    def begin_frame(self):
+        self._started = time.perf_counter()
+
+    def end_frame(self, visuals, relayouts):
+        if self._started is None:
+            return
+        ended = time.perf_counter()
+        self._frames.append((ended, ended - self._started, visuals, relayouts, self._costs))
+        self._costs = {}
+        self._started = None
+
+    def summary(self, seconds=1.0):
+        """Returns `{'fps', 'draw_p50', 'draw_p95', 'draw_max', 'visuals', 'relayouts', 'timers', 'events'}` over
+        the frames of the last `seconds`: durations in seconds, and relayouts and callback costs per second.
+        """
+        now = time.perf_counter()
+        recent = []
+        for frame in reversed(self._frames):
+            if frame[0] < now - seconds:
+                break
+            recent.append(frame)
+        draws = sorted(frame[1] for frame in recent)
+        costs = collections.Counter()
+        for frame in recent:
+            for name, cost in frame[4].items():
+                costs[name.partition(':')[0]] += cost
+        return {'fps': len(recent) / seconds,
+                'draw_p50': draws[len(draws) // 2] if draws else 0.0,
+                'draw_p95': draws[int(len(draws) * 0.95)] if draws else 0.0,
+                'draw_max': draws[-1] if draws else 0.0,
+                'visuals': recent[0][2] if recent else 0,
+                'relayouts': sum(frame[3] for frame in recent) / seconds,
+                'timers': costs['timer'] / seconds,
+                'events': costs['event'] / seconds}
+
+    def rows(self):
+        """Returns the column names and a row per frame, with times relative to the first frame kept.
+        """
+        names = sorted(set(name for frame in self._frames for name in frame[4]))
+        first = self._frames[0][0] if self._frames else 0.0
+        rows = [[ended - first, draw, visuals, relayouts] + [costs.get(name, 0.0) for name in names]
+                for ended, draw, visuals, relayouts, costs in self._frames]
+        return ['time', 'draw', 'visuals', 'relayouts'] + names, rows
+
+    def write(self, path):
+        """Writes the frames to `path`, as CSV if it ends with `.csv` and as a JSON list of objects otherwise.
+        """
+        columns, rows = self.rows()
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            if path.endswith('.csv'):
+                writer = csv.writer(stream)
+                writer.writerow(columns)
+                writer.writerows(rows)
+            else:
+                json.dump([dict(zip(columns, row)) for row in rows], stream, indent=1)
+                stream.write('\n')
@@ -0,0 +1,109 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+"""Tests of `window.TerminalWindow` drawing into a stub canvas, with timers that only fire when told to.
+
+    python -m unittest discover tests
+"""
+
+import collections
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vispy.scene
+import vispy.util.event
+
+import window
+
+KeyEvent = collections.namedtuple('KeyEvent', 'key text modifiers')
+Key = collections.namedtuple('Key', 'name')
+
+
+class StubCanvas(object):
+
+    def __init__(self, size=(1280, 720)):
+        object.__init__(self)
+        self.size = size
+        self.events = vispy.util.event.EmitterGroup(resize=None, key_press=None, key_release=None,
+                                                    mouse_press=None, mouse_wheel=None, draw=None)
+        self.central_widget = vispy.scene.Node()
+
+
+class ManualTimer(object):
+    """Follows `vispy.app.Timer`: a timer that ran out of iterations stays running until its next tick.
+    """
+
+    def __init__(self, callback, iterations):
+        object.__init__(self)
+        self.callback = callback
+        self.iterations = iterations
+        self.count = 0
+        self.running = False
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.count = 0
+
+    def stop(self):
+        self.running = False
+
+    def tick(self):
+        if not self.running:
+            return
+        if 0 <= self.iterations <= self.count:
+            self.stop()
+            return
+        self.callback(None)
+        self.count += 1
+
+
+class OffscreenTerminal(window.TerminalWindow):
+
+    def _create_canvas(self):
+        self.canvas = StubCanvas()
+        self.widget = self.canvas.central_widget
+        self.widget.set_transform('matrix')
+        self.widget.transform.translate((0.0, -window.CONSOLE_LINEOFFSET))
+        self.old_size = self.canvas.size
+
+    def _create_timer(self, interval, callback, iterations=-1):
+        return ManualTimer(callback, iterations)
+
+
+class TestRedraw(unittest.TestCase):
+
+    def type(self, terminal, char):
+        event = KeyEvent(Key(char.upper()), char, ())
+        terminal.on_key_press(event)
+        terminal.on_key_release(event)
+
+    def test_key_typed_after_redraw_is_shown(self):
+        terminal = OffscreenTerminal()
+        self.type(terminal, 'a')
+        terminal._redraw_timer.tick()
+        self.assertEqual(terminal.entries[0].text, window.CONSOLE_PREFIX + 'a')
+
+        self.type(terminal, 'b')  # Before the next tick of the redraw timer.
+        terminal._redraw_timer.tick()
+        self.assertEqual(terminal.entries[0].text, window.CONSOLE_PREFIX + 'ab')
+
+    def test_keys_within_a_frame_are_drawn_once(self):
+        terminal = OffscreenTerminal()
+        relayouts = terminal.relayouts
+        for char in 'abc':
+            self.type(terminal, char)
+        terminal._redraw_timer.tick()
+        terminal._redraw_timer.tick()
+        self.assertEqual(terminal.entries[0].text, window.CONSOLE_PREFIX + 'abc')
+        self.assertEqual(terminal.relayouts - relayouts, 2)
+        self.assertFalse(terminal._redraw_timer.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import bisect
+import collections
+import itertools
+import os
+
+
+class _Node(object):
+    """Node of a radix tree, reached from its parent through the edge `label`.
+    """
+
+    __slots__ = ('label', 'children', 'terminal', 'entries')
+
+    def __init__(self, label):
+        self.label = label
+        self.children = {}      # first character of the edge -> child node
+        self.terminal = False   # Whether the path to this node is a key.
+        self.entries = None     # Increasing sequence numbers of the entries below, see `HistoryTrie`.
+
+
+class Trie(object):
+    """Radix tree of strings for prefix completion. Chains of nodes with a single child are merged into one edge,
+    so that large sets of names with long common prefixes only take a node or two per name. Keys are added one by
+    one and can be looked up right away.
+    """
+
+    def __init__(self, keys=()):
+        object.__init__(self)
+        self._root = _Node('')
+        self._count = 0
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        node, path = self._locate(key)
+        return node is not None and path == key and node.terminal
+
+    def add(self, key):
+        """Adds the `key`, returns whether it was new.
+        """
+        node = self._path(key)[-1]
+        if node.terminal:
+            return False
+        node.terminal = True
+        self._count += 1
+        return True
+
+    def _path(self, key):
+        """Returns the nodes from the root to the node of `key`, creating and splitting nodes as needed.
+        """
+        node = self._root
+        nodes = [node]
+        index = 0
+        while index < len(key):
+            child = node.children.get(key[index])
+            if child is None:
+                child = node.children[key[index]] = _Node(key[index:])
+            else:
+                label = child.label
+                if key.startswith(label, index):
+                    common = len(label)
+                else:
+                    common = len(os.path.commonprefix((label, key[index:index + len(label)])))
+                if common < len(label):
+                    # The key leaves the edge half-way, which becomes two edges.
+                    middle = node.children[key[index]] = _Node(label[:common])
+                    if child.entries is not None:
+                        middle.entries = collections.deque(child.entries)
+                    child.label = label[common:]
+                    middle.children[child.label[0]] = child
+                    child = middle
+            index += len(child.label)
+            node = child
+            nodes.append(node)
+        return nodes
+
+    def _locate(self, prefix):
+        """Returns the highest node below which all keys start with `prefix`, and the path to that node, which
+        may be longer than the `prefix`. Returns `None` and `None` if no key starts with it.
+        """
+        node = self._root
+        index = 0
+        while index < len(prefix):
+            node = node.children.get(prefix[index])
+            if node is None:
+                return None, None
+            if prefix.startswith(node.label, index):
+                index += len(node.label)
+            elif node.label.startswith(prefix[index:]):
+                return node, prefix[:index] + node.label
+            else:
+                return None, None
+        return node, prefix
+
+    def complete(self, prefix, limit=None):
+        """Returns the keys starting with `prefix` in sorted order, at most `limit` of them.
+        """
+        node, path = self._locate(prefix)
+        if node is None:
+            return []
+        keys = []
+        stack = [(node, path)]
+        while stack and (limit is None or len(keys) < limit):
+            node, path = stack.pop()
+            if node.terminal:
+                keys.append(path)
+            for first in sorted(node.children, reverse=True):
+                child = node.children[first]
+                stack.append((child, path + child.label))
+        return keys
+
+    def common_prefix(self, prefix):
+        """Returns the longest string that all keys starting with `prefix` start with, or `None` if there is no
+        such key.
+        """
+        node, path = self._locate(prefix)
+        if node is None:
+            return None
+        while not node.terminal and len(node.children) == 1:
+            node = next(iter(node.children.values()))
+            path += node.label
+        return path
+
+
+class HistoryTrie(Trie):
+    """History of entered lines for reverse prefix search. Every node keeps the sequence numbers of the entries
+    below it in increasing order, so the most recent entry with a given prefix before a given one is found by a
+    binary search in the node of the prefix. The oldest entries are dropped once there are more than `capacity`.
+    """
+
+    def __init__(self, capacity=10000):
+        Trie.__init__(self)
+        self._capacity = capacity
+        self._entries = collections.OrderedDict()  # sequence number -> line, oldest first
+        self._numbers = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, line):
+        """Appends the `line` as the most recent entry, returns its sequence number.
+        """
+        number = next(self._numbers)
+        self._entries[number] = line
+        for node in self._path(line):
+            if node.entries is None:
+                node.entries = collections.deque()
+            node.entries.append(number)
+        if len(self._entries) > self._capacity:
+            self._drop_oldest()
+        return number
+
+    def _drop_oldest(self):
+        number, line = self._entries.popitem(last=False)
+        node = self._root
+        node.entries.popleft()
+        index = 0
+        while index < len(line):
+            child = node.children[line[index]]
+            child.entries.popleft()
+            if not child.entries:
+                del node.children[line[index]]  # The whole branch only held this entry.
+                return
+            index += len(child.label)
+            node = child
+
+    def search(self, prefix, before=None):
+        """Returns `(number, line)` of the most recent entry starting with `prefix` that is older than the entry
+        `before`, or `None` if there is none.
+        """
+        node, _ = self._locate(prefix)
+        if node is None or not node.entries:
+            return None
+        entries = node.entries
+        index = len(entries) if before is None else bisect.bisect_left(entries, before)
+        if not index:
+            return None
+        number = entries[index - 1]
+        return number, self._entries[number]
@@ -3,15 +3,28 @@
 # Copyright (c) 2015, AiGameDev.com KG.
 #
 
+import bisect
+import time
+
 import nuclai.bootstrap         # Demonstration specific setup.
 import vispy.scene              # Canvas & visuals for rendering.
 import vispy.util.event         # Events and observer support.
 
+from stats import FrameMetrics
+from trie import HistoryTrie
+
 CONSOLE_PREFIX = '> '
 CONSOLE_LINEHEIGHT = 40.0
 CONSOLE_LINEOFFSET = 16.0
 CONSOLE_MARGIN = 16.0
 MAX_BUFFER_SIZE = 64
+SEARCH_HISTORY_SIZE = 10000     # Entered lines kept for the reverse search with Ctrl+R.
+CURSOR_BLINK_INTERVAL = 1.0 / 3.0
+CURSOR_BLINK_TIMEOUT = 10.0     # Seconds without key presses after which the cursor stops blinking.
+KEY_REPEAT_INTERVAL = 0.025
+KEY_REPEAT_DELAY = 0.5
+REDRAW_INTERVAL = 1.0 / 60.0    # Changes of the input line are coalesced and applied at most once per frame.
+OVERLAY_INTERVAL = 0.5          # Refresh interval of the performance overlay toggled with F3.
 
 
 class TextEvent(vispy.util.event.Event):
@@ -23,6 +36,51 @@ class TextEvent(vispy.util.event.Event):
         self.text = text
 
 
+class ScrollbackSlot(object):
+    """One block of lines of the visible history, drawn by a single visual. Keeps a reusable Text visual per
+    alignment, created on first use.
+    """
+
+    def __init__(self):
+        object.__init__(self)
+        self.visuals = {}
+        self.align = None
+        self.lines = 0
+        self.key = None
+        self.row = None
+
+    def show(self, terminal, texts, align, color):
+        if align != self.align:
+            self.hide(terminal)
+        text = texts[0] if len(texts) == 1 else list(texts)
+        visual = self.visuals.get(align)
+        if visual is None:
+            visual = self.visuals[align] = terminal._create_text(text, align, color, terminal.entry_offset)
+            terminal.entries.append(visual)
+        else:
+            visual.text = text
+            visual.color = color
+            terminal.relayouts += 1
+        self.align = align
+        self.lines = len(texts)
+
+    def hide(self, terminal):
+        if self.align is not None:
+            self.visuals[self.align].text = ''
+            self.align = None
+            terminal.relayouts += 1
+
+    def move(self, terminal, offset):
+        """Moves the block so that its last line is drawn at the vertical `offset`.
+        """
+        position = terminal._align_position(self.align)
+        if self.lines == 1:
+            self.visuals[self.align].pos = [position, offset, 0.0]
+        else:
+            self.visuals[self.align].pos = [[position, offset - (self.lines - 1 - line) * CONSOLE_LINEHEIGHT, 0.0]
+                                            for line in range(self.lines)]
+
+
 class TerminalWindow(object):
     """Creates and manages a window used for terminal input. You can setup notifications via
     `self.events` that emits notifications for user inputs and user commands. 
@@ -31,9 +89,13 @@ class TerminalWindow(object):
     def __init__(self):
         """Constructor sets up events, creates a canvas and data for processing input.
         """ 
+        self.metrics = None             # Rolling `stats.FrameMetrics`, see `enable_metrics`.
+        self.relayouts = 0              # Times the text of a visual was set, i.e. its glyphs were laid out again.
+        self._overlay = None
         self.events = vispy.util.event.EmitterGroup(
                                 user_input=TextEvent,
-                                user_command=TextEvent)
+                                user_command=TextEvent,
+                                user_cancel=TextEvent)
  
         self._create_canvas()
         self._create_terminal()
@@ -52,15 +114,21 @@ class TerminalWindow(object):
         self.widget.set_transform('matrix')
         self.widget.transform.translate((0.0, -CONSOLE_LINEOFFSET))
 
-        vispy.scene.visuals.GridLines(parent=self.widget, scale=(0.0, 15.984/CONSOLE_LINEHEIGHT))
-
         self.canvas.show(visible=True)
         self.canvas.events.mouse_press()            # HACK: Layout workaround for bug in Vispy 0.5.0.
 
         self.old_size = self.canvas.size
-        self.canvas.events.resize.connect(self.on_resize)
-        self.canvas.events.key_press.connect(self.on_key_press)
-        self.canvas.events.key_release.connect(self.on_key_release)
+        self.canvas.events.resize.connect(self._measured('event: resize', self.on_resize))
+        self.canvas.events.key_press.connect(self._measured('event: key_press', self.on_key_press))
+        self.canvas.events.key_release.connect(self._measured('event: key_release', self.on_key_release))
+        self.canvas.events.draw.connect(self.on_first_draw)
+
+    def on_first_draw(self, _):
+        """The grid lines are only decoration, they are added after the first frame showed the prompt.
+        """
+        self.canvas.events.draw.disconnect(self.on_first_draw)
+        vispy.scene.visuals.GridLines(parent=self.widget, scale=(0.0, 15.984/CONSOLE_LINEHEIGHT))
+        self.canvas.update()
 
     def _create_terminal(self):
         """Setup everything that's necessary for processing key events and the text.
@@ -69,47 +137,126 @@ class TerminalWindow(object):
         self.entry_offset = CONSOLE_LINEOFFSET - CONSOLE_LINEHEIGHT / 2 + self.canvas.size[1] 
         self.entry_blink = 0
         self.entries = []
+        self.history = []
+        self.history_ends = []
+        self.history_offset = 0
         self.text_log = ['']
         self.log_index = 0
         self.log_message_modified = False
+        self.completer = None           # Returns the completed input and its candidates, see `HAL9000.complete`.
+        self._input_history = HistoryTrie(SEARCH_HISTORY_SIZE)
+        self._history_search = None     # Prefix and entry number of the current reverse search.
         self._pressed_buttons = {}
+        self._slots = []
 
         self._key_handlers = {
             'Enter': self._on_press_enter,
             'Backspace': self._on_press_backspace,
             'Up': self._on_press_up,
-            'Down': self._on_press_down
+            'Down': self._on_press_down,
+            'PageUp': self._on_press_page_up,
+            'PageDown': self._on_press_page_down,
+            'Tab': self._on_press_tab,
+            'F3': self._on_press_f3
+        }
+        self._control_key_handlers = {
+            'C': self._on_press_control_c,
+            'R': self._on_press_control_r
         }
 
-        self.log(CONSOLE_PREFIX, color='#1463A3')
-
-        timer = vispy.app.Timer(interval=1.0 / 3.0)
-        timer.connect(self.on_blink)
-        timer.start()
-
-        timer2 = vispy.app.Timer(interval=0.025)
-        timer2.connect(self.on_repeat_keys)
-        timer2.start()
+        # The input prompt always stays on the bottom line, the history is drawn above it.
+        self.scroll(CONSOLE_LINEHEIGHT)
+        self.entry_offset += CONSOLE_LINEHEIGHT
+        # The blinking cursor is a second copy of the prompt, so blinking only toggles which one is visible.
+        self.entries.append(self._create_text(CONSOLE_PREFIX, 'left', '#1463A3', self.entry_offset))
+        self._cursor = self._create_text(CONSOLE_PREFIX + '_', 'left', '#1463A3', self.entry_offset)
+        self.entries.append(self._cursor)
+        self._input_dirty = False
+        self.canvas.events.mouse_wheel.connect(self._measured('event: mouse_wheel', self.on_mouse_wheel))
+
+        # Timers only run while there is something to do: blinking stops when idle, keys repeat while held.
+        self._blink_timer = self._create_timer(CURSOR_BLINK_INTERVAL, self.on_blink)
+        self._blink_timer.start()
+        self._repeat_timer = self._create_timer(KEY_REPEAT_INTERVAL, self.on_repeat_keys)
+        self._redraw_timer = self._create_timer(REDRAW_INTERVAL, self.on_redraw, iterations=1)
+
+    def _create_timer(self, interval, callback, iterations=-1):
+        """Creates a stopped timer, windows created without an event loop can override this together with
+        `_create_canvas`.
+        """
+        callback = self._measured('timer: ' + callback.__name__, callback)
+        return vispy.app.Timer(interval=interval, connect=callback, iterations=iterations)
 
-    def scroll(self, height):
-        self.widget.transform.translate((0.0, -height))
+    def _measured(self, name, callback):
+        """Wraps an event or timer `callback` so that its cost is added to the current frame of the metrics, if
+        they are enabled.
+        """
+        def wrapper(evt):
+            if self.metrics is None:
+                return callback(evt)
+            started = time.perf_counter()
+            try:
+                return callback(evt)
+            finally:
+                self.metrics.add_cost(name, time.perf_counter() - started)
+        return wrapper
+
+    def enable_metrics(self, metrics=None):
+        """Starts recording the draw time, visuals, re-layouts and callback costs of every frame into `metrics`, a
+        new `stats.FrameMetrics` by default. Returns the recorder, which is also kept as `self.metrics`.
+        """
+        if self.metrics is None:
+            self.metrics = metrics or FrameMetrics()
+            self.canvas.events.draw.connect(self.on_draw_begin, position='first')
+            self.canvas.events.draw.connect(self.on_draw_end, position='last')
+        return self.metrics
 
-    def on_resize(self, evt):
-        self.scroll(self.old_size[1] - evt.size[1])
-        self.old_size = evt.size
+    def on_draw_begin(self, _):
+        self.metrics.begin_frame()
 
-    def log(self, text, align='left', color='#1463A3'):
-        assert align in ('left', 'right', 'center')
+    def on_draw_end(self, _):
+        self.metrics.end_frame(len(self.entries), self.relayouts)
+        self.relayouts = 0
 
-        if align == 'center':
-            position = self.canvas.size[0] / 2
-        elif align == 'left':
-            position = CONSOLE_MARGIN
+    def toggle_overlay(self):
+        """Shows or hides a line of render metrics in the top right corner, enabling the metrics if needed.
+        """
+        if self._overlay is None:
+            self.enable_metrics()
+            self._overlay = vispy.scene.visuals.Text(parent=self.canvas.scene,
+                                                     text='',
+                                                     face='Questrial',
+                                                     color='#808080',
+                                                     font_size=10,
+                                                     anchor_x='right',
+                                                     anchor_y='top',
+                                                     pos=self._overlay_position())
+            self._overlay_timer = self._create_timer(OVERLAY_INTERVAL, self.on_overlay)
+            self._overlay.visible = False
+        self._overlay.visible = not self._overlay.visible
+        if self._overlay.visible:
+            self.on_overlay(None)
+            self._overlay_timer.start()
         else:
-            position = self.canvas.size[0] - CONSOLE_MARGIN
+            self._overlay_timer.stop()
+            self.canvas.update()
+
+    def _overlay_position(self):
+        return [self.canvas.size[0] - CONSOLE_MARGIN / 2, CONSOLE_MARGIN / 2, 0.0]
 
-        if text != '':
-            entry = vispy.scene.visuals.Text(parent=self.widget,
+    def on_overlay(self, _):
+        """Shows the metrics of the last second. The overlay itself is not counted as a re-layout.
+        """
+        summary = self.metrics.summary()
+        self._overlay.text = ('{fps:.0f} fps   draw {p50:.1f} / {p95:.1f} ms   {visuals} visuals   '
+                              '{relayouts:.0f} layouts/s   timers {timers:.1f} ms/s   events {events:.1f} ms/s').format(
+            fps=summary['fps'], p50=summary['draw_p50'] * 1000.0, p95=summary['draw_p95'] * 1000.0,
+            visuals=summary['visuals'], relayouts=summary['relayouts'], timers=summary['timers'] * 1000.0,
+            events=summary['events'] * 1000.0)
+
+    def _create_text(self, text, align, color, offset):
+        self.relayouts += 1
+        entry = vispy.scene.visuals.Text(parent=self.widget,
                                          text=text,
                                          face='Questrial',
                                          color=color,
@@ -117,37 +264,153 @@ class TerminalWindow(object):
                                          font_size=20,
                                          anchor_x=align,
                                          anchor_y='bottom',
-                                         pos=[position, self.entry_offset, 0.0])
-            self.entries.append(entry)
+                                         pos=[self._align_position(align), offset, 0.0])
+        return entry
 
-        self.scroll(CONSOLE_LINEHEIGHT)
-        self.entry_offset += CONSOLE_LINEHEIGHT
-        
-        self.entries[0].pos[0][1] = self.entry_offset
+    def _align_position(self, align):
+        if align == 'center':
+            return self.canvas.size[0] / 2
+        elif align == 'left':
+            return CONSOLE_MARGIN
+        return self.canvas.size[0] - CONSOLE_MARGIN
+
+    def scroll(self, height):
+        self.widget.transform.translate((0.0, -height))
+
+    def on_resize(self, evt):
+        self.scroll(self.old_size[1] - evt.size[1])
+        self.old_size = evt.size
+        if self._overlay is not None:
+            self._overlay.pos = self._overlay_position()
+        for slot in self._slots:
+            slot.row = None  # Horizontal positions depend on the width of the canvas.
+        self._show_history()
+
+    def log(self, text, align='left', color='#1463A3'):
+        self.log_lines([(text, align, color)])
+
+    def log_lines(self, lines):
+        """Logs a list of `(text, align, color)` lines at once. Consecutive lines with the same alignment and
+        color are drawn by a single visual, and the view is only updated once for the whole batch.
+        """
+        batch = len(self.history)
+        for text, align, color in lines:
+            assert align in ('left', 'right', 'center')
+            if len(self.history) > batch and self.history[-1][1:] == (align, color):
+                self.history[-1][0].append(text)
+                self.history_ends[-1] += 1
+            else:
+                self.history.append(([text], align, color))
+                self.history_ends.append((self.history_ends[-1] if self.history_ends else 0) + 1)
+
+        self.history_offset = 0
+        self._show_history()
+
+    def scroll_history(self, lines):
+        """Scrolls the history back by a number of `lines`, or forward if `lines` is negative.
+        """
+        rows = self.history_ends[-1] if self.history_ends else 0
+        offset = max(0, min(self.history_offset + lines, rows - self._visible_lines() + 1))
+        if offset != self.history_offset:
+            self.history_offset = offset
+            self._show_history()
+
+    def _visible_lines(self):
+        return int(self.canvas.size[1] / CONSOLE_LINEHEIGHT) + 1
+
+    def _show_history(self):
+        """Draws the visible part of the history with a fixed pool of reused visuals. History block `index` is
+        always drawn by slot `index % len(slots)`, so scrolling only re-lays out the blocks that became visible
+        and merely moves the others.
+        """
+        count = self._visible_lines()
+        if count > len(self._slots):
+            self._slots.extend(ScrollbackSlot() for _ in range(count - len(self._slots)))
+            for slot in self._slots:
+                slot.key = -1  # Blocks are assigned to different slots now.
+
+        # Rows of the history are numbered from the top, `last_row` is the one right above the input prompt.
+        last_row = (self.history_ends[-1] if self.history_ends else 0) - self.history_offset
+        first = bisect.bisect_right(self.history_ends, max(0, last_row - count))
+        last = bisect.bisect_right(self.history_ends, last_row - 1) + 1 if last_row > 0 else 0
+
+        for number, slot in enumerate(self._slots):
+            index = first + (number - first) % len(self._slots)
+            if index >= last:
+                if slot.key is not None:
+                    slot.hide(self)
+                    slot.key = None
+                continue
+
+            texts, align, color = self.history[index]
+            hidden = max(0, self.history_ends[index] - last_row)  # Lines of the block below the prompt.
+            if slot.key != (index, hidden):
+                slot.show(self, texts[:len(texts) - hidden], align, color)
+                slot.key = (index, hidden)
+                slot.row = None
+            row = last_row - self.history_ends[index] + hidden + 1
+            if slot.row != row:
+                slot.move(self, self.entry_offset - row * CONSOLE_LINEHEIGHT)
+                slot.row = row
 
     def show_input(self, text):
         self.entries[0].text = CONSOLE_PREFIX + text
-        self.entries[0].update()
+        self._cursor.text = CONSOLE_PREFIX + text + '_'
+        self.relayouts += 2
+
+    def _invalidate_input(self):
+        """Schedules the input line to be re-laid out on the next frame.
+        """
+        self._input_dirty = True
+        if not self._redraw_timer.running:
+            self._redraw_timer.start()
+
+    def on_redraw(self, _):
+        # The one-shot timer keeps `running` until its next tick, which stops it without calling back, so a key
+        # typed in between would not start it again: stop it here instead.
+        self._redraw_timer.stop()
+        if self._input_dirty:
+            self._input_dirty = False
+            self.show_input(self.text_buffer)
+
+    def _show_cursor(self, visible):
+        self.entries[0].visible = not visible
+        self._cursor.visible = visible
 
     def on_key_press(self, evt):
         if evt.key.name not in self._pressed_buttons:
             self._pressed_buttons[evt.key.name] = [evt, 0.0]
+            if not self._repeat_timer.running:
+                self._repeat_timer.start()
+
+        self.entry_blink = 0
+        self._show_cursor(True)
+        if not self._blink_timer.running:
+            self._blink_timer.start()
 
         self._key_press_handler(evt)
 
     def _key_press_handler(self, evt):
-        if evt.text:
-            self.on_key_char(evt.text)
-
         c = evt.key
-        handler = self._key_handlers.get(c.name, self._on_press_any)
+        handler = None
+        if 'Control' in evt.modifiers:
+            handler = self._control_key_handlers.get(c.name)
+        if handler != self._on_press_control_r:
+            self._history_search = None
+
+        if handler is None:
+            if evt.text and evt.text.isprintable():
+                self.on_key_char(evt.text)
+            handler = self._key_handlers.get(c.name, self._on_press_any)
         handler()
 
-        self.show_input(self.text_buffer)
+        self._invalidate_input()
 
     def on_key_release(self, evt):
         if evt.key.name in self._pressed_buttons:
             del self._pressed_buttons[evt.key.name]
+        if not self._pressed_buttons:
+            self._repeat_timer.stop()
 
     def _on_press_enter(self):
         if self.text_buffer:
@@ -156,6 +419,9 @@ class TerminalWindow(object):
             else:
                 self.log(self.text_buffer, align='left')
                 self.events.user_input(TextEvent(self.text_buffer))
+            last = self._input_history.search('')
+            if last is None or last[1] != self.text_buffer:
+                self._input_history.add(self.text_buffer)
             if self.log_message_modified or self.log_index != -1:
                 self.text_log.append(self.text_buffer)
                 if len(self.text_log) > MAX_BUFFER_SIZE:
@@ -183,22 +449,63 @@ class TerminalWindow(object):
             self.text_buffer = self.text_log[self.log_index]
             self.log_message_modified = False
 
+    def _on_press_tab(self):
+        if self.completer is None:
+            return
+        text, candidates = self.completer(self.text_buffer)
+        if text != self.text_buffer:
+            self.text_buffer = text
+            self.log_message_modified = True
+        elif candidates:
+            self.log(', '.join(candidates), align='left', color='#808080')
+
+    def _on_press_f3(self):
+        self.toggle_overlay()
+
+    def _on_press_control_c(self):
+        self.events.user_cancel(TextEvent(''))
+
+    def _on_press_control_r(self):
+        """Reverse search: shows the most recent entered line starting with the text typed before the search
+        began, every further press steps to an older one.
+        """
+        prefix, before = self._history_search or (self.text_buffer, None)
+        found = self._input_history.search(prefix, before)
+        while found is not None and found[1] == self.text_buffer:
+            found = self._input_history.search(prefix, found[0])  # The line shown already.
+        if found is None:
+            self._history_search = prefix, before
+            return
+        self._history_search = prefix, found[0]
+        self.text_buffer = found[1]
+        self.log_message_modified = True
+
+    def _on_press_page_up(self):
+        self.scroll_history(self._visible_lines() - 2)
+
+    def _on_press_page_down(self):
+        self.scroll_history(2 - self._visible_lines())
+
+    def on_mouse_wheel(self, evt):
+        self.scroll_history(int(evt.delta[1] * 3))
+
     def _on_press_any(self):
         self.log_message_modified = True
 
     def on_key_char(self, text):
         self.text_buffer += text
-        self.show_input(self.text_buffer)
+        self._invalidate_input()
 
     def on_blink(self, _):
-        if (self.entry_blink%2) == 0:
-            self.show_input(self.text_buffer+'_')
-        if (self.entry_blink%2) == 1:
-            self.show_input(self.text_buffer)
         self.entry_blink += 1
+        if self.entry_blink * CURSOR_BLINK_INTERVAL > CURSOR_BLINK_TIMEOUT:
+            self._show_cursor(True)
+            self._blink_timer.stop()
+            return
+        self._show_cursor((self.entry_blink % 2) == 0)
 
     def on_repeat_keys(self, evt):
         for _, v in self._pressed_buttons.items():
             v[1] += evt.dt
-            if v[1] > 0.5:
+            if v[1] > KEY_REPEAT_DELAY:
                 self._key_press_handler(v[0])
@@ -0,0 +1,158 @@
+#
+# This file is part of The Principles of Modern Game AI.
+# Copyright (c) 2015, AiGameDev.com KG.
+#
+
+import queue
+import threading
+import time
+import traceback
+
+
+class BufferedTerminal(object):
+    """Stand-in for `window.TerminalWindow` without a window, e.g. on the worker thread, keeps logged lines until
+    they are taken.
+    """
+
+    def __init__(self):
+        object.__init__(self)
+        self.lines = []
+
+    def log(self, text, align='left', color='#1463A3'):
+        assert align in ('left', 'right', 'center')
+        self.lines.append((text, align, color))
+
+    def log_lines(self, lines):
+        for text, align, color in lines:
+            self.log(text, align, color)
+
+    def take(self):
+        """Returns and forgets all lines logged since the previous call, as `(text, align, color)` tuples.
+        """
+        lines, self.lines = self.lines, []
+        return lines
+
+    def flush(self):
+        """Returns and forgets all lines logged since the previous call, as JSON-ready response dictionaries.
+        """
+        return [{'text': text, 'align': align, 'color': color} for text, align, color in self.take()]
+
+
+class AgentWorker(object):
+    """Runs every call into an agent on a single worker thread, in the order they were submitted.
+
+    The agent logs to a `BufferedTerminal`. The lines logged by every call are queued as one result, which
+    `poll` hands to the real terminal on the UI thread, so responses appear in the order of the inputs. A call
+    that is running always finishes and shows its response, while `cancel` drops the calls still waiting. Only
+    one update of the agent is waiting at any time, updates coming faster than the agent handles them are skipped.
+    The agent quits by calling its `on_quit` attribute, which is replaced to call `on_quit` on the UI thread instead.
+    Its `on_update_interval` attribute is replaced the same way, by `on_update_interval` if given.
+    """
+
+    _QUIT = object()
+    _UPDATE_INTERVAL = object()
+
+    def __init__(self, agent, terminal, on_quit, stats=None, on_update_interval=None):
+        object.__init__(self)
+        self._agent = agent
+        self._terminal = terminal
+        self._stats = stats
+        self._on_quit = on_quit
+        self._on_update_interval = on_update_interval
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._outstanding = 0       # Calls submitted whose results were not polled yet, only used by the UI thread.
+        self._update_waiting = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        agent.on_quit = self._request_quit
+        if on_update_interval is not None:
+            agent.on_update_interval = self._request_update_interval
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, function, argument):
+        """Queues `function(argument)` to be called on the worker thread.
+        """
+        self._outstanding += 1
+        self._requests.put((function, argument, time.perf_counter()))
+
+    def submit_update(self, evt):
+        if not self._update_waiting.is_set():
+            self._update_waiting.set()
+            self.submit(self._update, evt)
+
+    def _update(self, evt):
+        self._update_waiting.clear()
+        self._agent.update(evt)
+
+    def busy(self):
+        return self._outstanding > 0
+
+    def cancel(self):
+        """Drops the calls that did not start yet and returns their number, not counting updates.
+        """
+        dropped = updates = 0
+        while True:
+            try:
+                function, _, _ = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if function == self._update:
+                self._update_waiting.clear()
+                updates += 1
+            else:
+                dropped += 1
+        self._outstanding -= dropped + updates
+        return dropped
+
+    def poll(self, log_lines):
+        """Passes the lines of every finished call to `log_lines`, in the order the calls were submitted.
+        Returns the number of finished calls.
+        """
+        finished = 0
+        while True:
+            try:
+                lines = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if lines is AgentWorker._QUIT:
+                self._on_quit()
+                continue
+            if lines is AgentWorker._UPDATE_INTERVAL:
+                self._on_update_interval()
+                continue
+            finished += 1
+            if lines:
+                log_lines(lines)
+        self._outstanding -= finished
+        return finished
+
+    def stop(self):
+        """Drops the waiting calls and waits for the running one to finish.
+        """
+        self.cancel()
+        self._requests.put(None)
+        self._thread.join()
+
+    def _request_quit(self):
+        self._results.put(AgentWorker._QUIT)
+
+    def _request_update_interval(self):
+        self._results.put(AgentWorker._UPDATE_INTERVAL)
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            function, argument, submitted = request
+            if self._stats is not None:
+                self._stats.add('worker: queued', time.perf_counter() - submitted)
+            try:
+                function(argument)
+            except Exception:
+                traceback.print_exc()
+                self._terminal.log('I\'m afraid I can\'t do that.', align='right', color='#00805A')
+            self._results.put(self._terminal.take())